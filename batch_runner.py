@@ -0,0 +1,162 @@
+# batch_runner.py
+# -*- coding: utf-8 -*-
+# Bezgłowe uruchamianie korpusu programów testowych 6502 na wygenerowanym
+# mikrokodzie. Banki ROM są wczytywane raz, każdy program wykonuje się
+# w osobnym procesie roboczym (pula procesów), a wynik trafia do JSON.
+#
+# Pułapka (trap) = instrukcja, po której kolejny FETCH następuje z tego samego
+# adresu (JMP *, BNE * itp.) - tak kończą się programy w stylu testów funkcjonalnych.
+# Pułapka pod adresem --success oznacza PASS, pod adresem z --fail - FAIL; przy
+# podanym --success każda inna pułapka to też FAIL, bez niego - status "trap".
+# Kod wyjścia 1: FAIL, TIMEOUT lub ERROR w którymkolwiek programie.
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from executor import MicrocodeExecutor, load_banks, parse_int
+from ucode import OUTPUT_DIR
+
+DEFAULT_BUDGET = 100_000_000
+DEFAULT_JOBS = os.cpu_count() or 1
+
+# Wykonawca procesu roboczego (tworzony raz na proces przez _init_worker)
+_worker_executor = None
+
+
+def _init_worker(rom):
+    global _worker_executor
+    _worker_executor = MicrocodeExecutor(rom)
+
+
+def run_until_trap(executor, budget):
+    """Wykonuje takty aż do pułapki lub wyczerpania budżetu. Zwraca adres pułapki albo None."""
+    step = executor.step
+    last_count = executor.instructions
+    last_pc = None
+    while executor.cycles < budget:
+        step()
+        if executor.instructions != last_count:
+            last_count = executor.instructions
+            pc = executor.insn_pc
+            if pc == last_pc:
+                return pc
+            last_pc = pc
+    return None
+
+
+def run_job(job):
+    """Uruchamia jeden program (w procesie roboczym) i zwraca słownik z wynikiem."""
+    executor = _worker_executor
+    result = {"program": job["program"], "status": "error", "trap": None,
+              "cycles": 0, "instructions": 0, "wall_time": 0.0, "cycles_per_second": 0}
+    try:
+        with open(job["program"], "rb") as f:
+            image = f.read()
+        executor.mem = bytearray(0x10000)
+        executor.load(image, job["load"])
+        executor.reset(job["start"])
+
+        started = time.perf_counter()
+        trap = run_until_trap(executor, job["budget"])
+        elapsed = time.perf_counter() - started
+
+        if trap is None:
+            result["status"] = "timeout"
+        elif trap == job["success"]:
+            result["status"] = "pass"
+        elif trap in job["fail"] or job["success"] is not None:
+            result["status"] = "fail"
+        else:
+            result["status"] = "trap"
+        result.update({
+            "trap": f"${trap:04X}" if trap is not None else None,
+            "cycles": executor.cycles,
+            "instructions": executor.instructions,
+            "wall_time": round(elapsed, 4),
+            "cycles_per_second": round(executor.cycles / elapsed) if elapsed else 0,
+            "registers": {name: f"{value:0{4 if name == 'PC' else 2}X}"
+                          for name, value in executor.registers().items()},
+        })
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def load_jobs(paths, defaults):
+    """Programy z linii poleceń (.bin) lub z manifestu JSON: [{"program", "load", "start", "success", "fail", "budget"}]."""
+    jobs = []
+    for path in paths:
+        if path.endswith(".json"):
+            with open(path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            base = os.path.dirname(path)
+            for entry in entries:
+                job = dict(defaults)
+                for key in ("load", "start", "success", "budget"):
+                    if entry.get(key) is not None:
+                        value = entry[key]
+                        job[key] = parse_int(value) if isinstance(value, str) else value
+                if entry.get("fail") is not None:
+                    values = entry["fail"] if isinstance(entry["fail"], list) else [entry["fail"]]
+                    job["fail"] = [parse_int(v) if isinstance(v, str) else v for v in values]
+                job["program"] = os.path.join(base, entry["program"])
+                jobs.append(job)
+        else:
+            jobs.append(dict(defaults, program=path))
+    return jobs
+
+
+def run_batch(jobs, rom, workers=DEFAULT_JOBS):
+    with ProcessPoolExecutor(max_workers=max(1, workers), initializer=_init_worker, initargs=(rom,)) as pool:
+        return list(pool.map(run_job, jobs))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Uruchamia korpus programów 6502 na mikrokodzie (równolegle, bez GUI).")
+    parser.add_argument("programs", nargs="+", help="pliki .bin lub manifesty .json")
+    parser.add_argument("--load", type=parse_int, default=0x0000, help="adres ładowania (domyślnie $0000)")
+    parser.add_argument("--start", type=parse_int, default=None, help="adres startu (domyślnie wektor RESET)")
+    parser.add_argument("--success", type=parse_int, default=None, help="adres pułapki oznaczającej sukces")
+    parser.add_argument("--fail", type=parse_int, action="append", default=[],
+                        help="adres pułapki oznaczającej błąd (można podać wielokrotnie)")
+    parser.add_argument("--budget", type=int, default=DEFAULT_BUDGET, help="limit taktów na program")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="liczba procesów roboczych")
+    parser.add_argument("--build-dir", default=OUTPUT_DIR, help="katalog z plikami wYbX.rom")
+    parser.add_argument("-o", "--output", default="batch_results.json", help="plik podsumowania JSON")
+    args = parser.parse_args()
+
+    defaults = {"load": args.load, "start": args.start, "success": args.success, "fail": args.fail,
+                "budget": args.budget}
+    batch_jobs = load_jobs(args.programs, defaults)
+
+    started = time.perf_counter()
+    results = run_batch(batch_jobs, load_banks(args.build_dir), args.jobs)
+    elapsed = time.perf_counter() - started
+
+    print(f"{'Status':<9}{'Pułapka':<9}{'Takty':>12}{'Takty/s':>12}{'Czas [s]':>10}  Program")
+    print("-" * 80)
+    for r in results:
+        print(f"{r['status'].upper():<9}{r['trap'] or '-':<9}{r['cycles']:>12}{r['cycles_per_second']:>12,.0f}"
+              f"{r['wall_time']:>10.2f}  {r['program']}" + (f"  ({r['error']})" if r.get("error") else ""))
+
+    counts = {}
+    for r in results:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    summary = {
+        "build_dir": args.build_dir,
+        "wall_time": round(elapsed, 4),
+        "total_cycles": sum(r["cycles"] for r in results),
+        "counts": counts,
+        "programs": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"\n{len(results)} programów w {elapsed:.2f} s: "
+          + ", ".join(f"{status}: {n}" for status, n in sorted(counts.items()))
+          + f". Podsumowanie: {args.output}")
+    sys.exit(1 if any(counts.get(status) for status in ("fail", "timeout", "error")) else 0)
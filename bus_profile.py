@@ -0,0 +1,169 @@
+# bus_profile.py
+# -*- coding: utf-8 -*-
+# Statyczny profil ruchu na magistrali pamięci, liczony z zasemblowanych słów
+# (MEM_READ_EN, MEM_WRITE_EN, ADDR_SOURCE), a nie z kodu symbolicznego.
+#
+# Jedno słowo = co najwyżej jedna transakcja: "DL := src; TMP := src" to jeden
+# odczyt (oba zatrzaski biorą tę samą szynę danych). Nadmiarowy odczyt to odczyt
+# tego samego adresu (to samo źródło i indeks), którego rejestry adresowe nie
+# zmieniły się od poprzedniego odczytu w tej samej instrukcji.
+
+import argparse
+import csv
+import json
+
+from executor import NUM_BANKS, assemble_rom, load_banks
+from instructions import MICROCODE_MAP
+from ucode import PACK_PLAN, apply_fetch_overlap, decode_microword
+
+# Sygnały, które zmieniają rejestry tworzące adres dla danego źródła
+ADDR_DEPENDENCIES = {
+    "pc": ("pc_inc_en", "pc_load_en"),
+    "stack": ("sp_int_inc_en", "sp_int_dec_en", "reg_sp_load_en"),
+    "latch": ("adl_load_en", "adh_load_en"),
+    "latch_inc": ("adl_load_en", "adh_load_en"),
+    "zeropage": ("adl_load_en",),
+    "zeropage_indirect": ("data_bus_in_en",),
+    "zeropage_indirect_inc": ("adl_load_en",),
+    "calculate_zp_x_pointer": ("data_bus_in_en", "reg_x_load_en"),
+    "irq_lsb": (),
+    "irq_msb": (),
+    "none": (),
+}
+INDEX_DEPENDENCIES = {"x_add_to_addr_en": "reg_x_load_en", "y_add_to_addr_en": "reg_y_load_en"}
+
+
+def _address_key(signals):
+    index = tuple(name for name in INDEX_DEPENDENCIES if signals[name])
+    return signals["addr_source_key"], index
+
+
+def _invalidated_by(signals, key):
+    source, index = key
+    deps = ADDR_DEPENDENCIES.get(source, ())
+    return (any(signals[name] for name in deps)
+            or any(signals[INDEX_DEPENDENCIES[name]] for name in index))
+
+
+def profile_instruction(words):
+    """Zwraca (odczyty, zapisy, bezczynne takty, [(T, T wcześniejszego odczytu, źródło)])."""
+    reads = writes = idle = 0
+    redundant = []
+    live = {}                                   # klucz adresu -> T ostatniego odczytu
+
+    for t, word in words:
+        signals = decode_microword(word, PACK_PLAN)
+        if signals["mem_read_en"]:
+            reads += 1
+            key = _address_key(signals)
+            if key in live:
+                redundant.append((t, live[key], "+".join((key[0],) + key[1])))
+            live[key] = t
+        elif signals["mem_write_en"]:
+            writes += 1
+            # Zapis pod adres też go "odświeża" - późniejszy odczyt czyta to, co zapisano
+            live.pop(_address_key(signals), None)
+        else:
+            idle += 1
+
+        # Zmiany rejestrów adresowych na zboczu kończącym takt
+        for key in [k for k in live if _invalidated_by(signals, k)]:
+            del live[key]
+
+    return reads, writes, idle, redundant
+
+
+def build_profile(microcode_map=MICROCODE_MAP, rom=None):
+    """Profil każdego opkodu. Przy nałożonym FETCH (SKIP_FETCH) T0 nie jest liczony."""
+    if rom is None:
+        rom = assemble_rom(microcode_map)
+
+    profile = {}
+    for opcode, (mnemonic, addressing_mode, cycles) in sorted(microcode_map.items()):
+        length = min(len(cycles), NUM_BANKS)
+        first = 1 if length and decode_microword(rom[((length - 1) << 8) | opcode])["skip_fetch_en"] else 0
+        words = [(t, rom[(t << 8) | opcode]) for t in range(first, length)]
+        reads, writes, idle, redundant = profile_instruction(words)
+        profile[opcode] = {
+            "mnemonic": mnemonic, "addressing": addressing_mode, "cycles": len(words),
+            "reads": reads, "writes": writes, "idle": idle, "redundant": redundant,
+        }
+    return profile
+
+
+def load_histogram(path):
+    """
+    Histogram opkodów: JSON {"A9": 120, ...} albo plik pokrycia z ucode_coverage
+    (liczba wykonań opkodu = trafienia jego slotu T1).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("format") == "ucode-coverage":
+        hits = {int(slot): count for slot, count in data["hits"].items()}
+        return {slot & 0xFF: count for slot, count in hits.items() if slot >> 8 == 1}
+    return {int(opcode, 16): count for opcode, count in data.items()}
+
+
+def print_profile(profile):
+    print(f"{'Opkod':<6}{'Instrukcja':<16}{'Takty':>6}{'Odczyt':>8}{'Zapis':>7}{'Wolne':>7}  Nadmiarowe odczyty")
+    print("-" * 80)
+    for opcode, p in profile.items():
+        redundant = ", ".join(f"T{t}=T{prev} {{{src}}}" for t, prev, src in p["redundant"])
+        print(f"  {opcode:02X}  {p['mnemonic']} {p['addressing']:<11}{p['cycles']:>6}{p['reads']:>8}"
+              f"{p['writes']:>7}{p['idle']:>7}  {redundant}")
+
+    flagged = sum(1 for p in profile.values() if p["redundant"])
+    print(f"\nOpkody z nadmiarowymi odczytami: {flagged}/{len(profile)}")
+
+
+def print_aggregate(profile, histogram):
+    totals = {"cycles": 0, "reads": 0, "writes": 0, "idle": 0, "redundant": 0}
+    unknown = 0
+    for opcode, count in histogram.items():
+        p = profile.get(opcode)
+        if p is None:
+            unknown += count
+            continue
+        for key in ("cycles", "reads", "writes", "idle"):
+            totals[key] += p[key] * count
+        totals["redundant"] += len(p["redundant"]) * count
+
+    cycles = totals["cycles"] or 1
+    print(f"\n--- Ruch na magistrali dla histogramu ({sum(histogram.values())} instrukcji) ---")
+    print(f"Takty:            {totals['cycles']}")
+    print(f"Odczyty:          {totals['reads']} ({totals['reads'] / cycles:.1%})")
+    print(f"Zapisy:           {totals['writes']} ({totals['writes'] / cycles:.1%})")
+    print(f"Wolna magistrala: {totals['idle']} ({totals['idle'] / cycles:.1%}) - dostępne dla DMA/wideo")
+    print(f"Nadmiarowe odczyty: {totals['redundant']}")
+    if unknown:
+        print(f"UWAGA: {unknown} instrukcji z opkodami spoza MICROCODE_MAP pominięto.")
+
+
+def write_csv(profile, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(['Opcode', 'Mnemonic', 'Addressing', 'Cycles', 'Reads', 'Writes', 'Idle', 'Redundant'])
+        for opcode, p in profile.items():
+            writer.writerow([f"{opcode:02X}", p["mnemonic"], p["addressing"], p["cycles"], p["reads"],
+                             p["writes"], p["idle"],
+                             " ".join(f"T{t}=T{prev}:{src}" for t, prev, src in p["redundant"])])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Statyczny profil ruchu na magistrali pamięci dla każdego opkodu.")
+    parser.add_argument("--overlap", action="store_true", help="profiluj mikrokod z nałożonym FETCH")
+    parser.add_argument("--build-dir", help="czytaj słowa z plików wYbX.rom zamiast składać je z mapy")
+    parser.add_argument("--histogram", help="JSON {opkod: liczba} lub plik pokrycia do agregacji")
+    parser.add_argument("--csv", help="zapisz profil do pliku CSV")
+    args = parser.parse_args()
+
+    microcode_map = apply_fetch_overlap(MICROCODE_MAP) if args.overlap else MICROCODE_MAP
+    rom = load_banks(args.build_dir) if args.build_dir else None
+    bus_profile = build_profile(microcode_map, rom)
+
+    print_profile(bus_profile)
+    if args.histogram:
+        print_aggregate(bus_profile, load_histogram(args.histogram))
+    if args.csv:
+        write_csv(bus_profile, args.csv)
+        print(f"\nZapisano profil do {args.csv}")
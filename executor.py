@@ -0,0 +1,469 @@
+# executor.py
+# -*- coding: utf-8 -*-
+# Wykonawca mikrokodu: interpretuje zasemblowane słowa W2/W1/W0 cykl po cyklu,
+# bez symulatora GUI. Wykonuje to, co faktycznie jest w ROM-ach (a nie to,
+# co zamierzał kod symboliczny), więc błędy mikrokodu są widoczne wprost.
+#
+# Model ścieżki danych (jeden takt):
+#   1. Adres: jeśli ADDR_OUT_BUS_EN, z ADDR_SOURCE (+X/+Y), inaczej poprzedni adres.
+#   2. Operand: REG_OUT (A/X/Y/SP/P/TMP/DL), PCH/PCL, a gdy nic nie steruje
+#      magistralą wewnętrzną - dane odczytane z pamięci (0xFF bez odczytu).
+#   3. ALU: operacja liczy wynik z (A, operand) i wystawia go na magistralę
+#      wewnętrzną (oraz do zatrzasku ALU); kod OUT wystawia zatrzask z poprzedniego
+#      taktu (RMW: "INC(TMP)", potem "*{zeropage} := ALU_RESULT"). Bez operacji
+#      ALU na magistrali jest operand. ALU_B_BUS_EN (W0.6) podaje na wejście B ALU
+#      szynę danych zamiast operandu ("DL := *src; ADC(A, DL)").
+#   4. Zbocze zegara: wszystkie rejestry (D-FlipFlop) zapamiętują nowe wartości,
+#      więc w tym samym takcie widoczne są wartości sprzed taktu - dotyczy to każdego
+#      odbiorcy DL ("ADL := DL; DL := *PC" zatrzaskuje w ADL poprzednią zawartość DL).
+#      DL i IR ładowane są z zewnętrznej szyny danych, IR tylko przy LOAD_IR_EN.
+# Arytmetyka jest binarna (tryb D nie jest modelowany), przerwania nie są modelowane.
+#
+# Mikrokod, którego ten model nie wykona poprawnie (ograniczenia ROM, nie modelu -
+# słowo sterujące nie ma sygnałów, których wymaga kod symboliczny):
+#   - RTS/RTI: brak sygnałów ładowania PCL/PCH ("PCL := DL" nie trafia do słowa),
+#   - CPX/CPY: ALU porównuje zawsze z A ("CMP(X, DL)" wystawia na operand DL),
+#   - (ZP,X), (ZP),Y, ZP,X, ZP,Y: adres efektywny wymaga dwóch źródeł w jednym
+#     takcie ("ADH := DL; ADL := TMP") lub sumatora ADL+X, którego słowo nie opisuje,
+#   - Abs: _get_read_src() w instructions.py nie odróżnia c_abs() od c_abs_x_read(),
+#     więc odczyt idzie spod {latch} + X,
+#   - LAX: "A := DL; X := DL; PASS(A)" ma jedno pole REG_OUT (A), więc ładuje A := A,
+#   - SLO/RLA/SRE/RRA/DCP/ISC: "DL := ALU_RESULT" nie ma sygnału, więc operacja
+#     końcowa z A liczy na wartości sprzed modyfikacji.
+# SMOKE_PROGRAMS (--smoke) sprawdzają ścieżkę, która działa: LDA/LDX #, STA ZP,
+# LDA ZP, TAX/INX/DEX, CLC/ADC #, PHA/PLA, BNE, JMP Abs.
+
+import argparse
+import os
+import sys
+import time
+
+from ucode import (ADDR_SOURCE_CODES, ALU_OP_CODES, OUTPUT_DIR, PACK_PLAN, REG_OUT_CODES,
+                   generate_microcode, unpack_fields)
+
+# ==============================================================================
+#  SEKCJA 1: STAŁE
+# ==============================================================================
+NUM_OPCODES = 256
+NUM_BANKS = 8
+NUM_SLOTS = NUM_OPCODES * NUM_BANKS     # slot = T * 256 + opkod (jak banki ROM)
+
+# IR po resecie: kolumna NOP (T0 każdego opkodu to ten sam FETCH).
+RESET_IR = 0xEA
+RESET_VECTOR = 0xFFFC
+
+# Flagi rejestru P
+FLAG_N, FLAG_V, FLAG_U, FLAG_B = 0x80, 0x40, 0x20, 0x10
+FLAG_D, FLAG_I, FLAG_Z, FLAG_C = 0x08, 0x04, 0x02, 0x01
+
+ALU_NONE, ALU_ADC, ALU_SBC, ALU_AND = (ALU_OP_CODES[k] for k in ("none", "adc", "sbc", "and"))
+ALU_ORA, ALU_XOR, ALU_BIT, ALU_CMP = (ALU_OP_CODES[k] for k in ("ora", "xor", "bit", "cmp"))
+ALU_ASL, ALU_LSR, ALU_ROL, ALU_ROR = (ALU_OP_CODES[k] for k in ("asl", "lsr", "rol", "ror"))
+ALU_INC, ALU_DEC, ALU_PASS, ALU_OUT = (ALU_OP_CODES[k] for k in ("inc", "dec", "pass", "out"))
+
+REG_A, REG_X, REG_Y, REG_SP = (REG_OUT_CODES[k] for k in ("a", "x", "y", "sp"))
+REG_P, REG_TMP, REG_DL = (REG_OUT_CODES[k] for k in ("p", "tmp", "dl"))
+
+ADDR_PC, ADDR_STACK, ADDR_LATCH = (ADDR_SOURCE_CODES[k] for k in ("pc", "stack", "latch"))
+ADDR_IRQ_LSB, ADDR_IRQ_MSB = ADDR_SOURCE_CODES["irq_lsb"], ADDR_SOURCE_CODES["irq_msb"]
+ADDR_ZEROPAGE = ADDR_SOURCE_CODES["zeropage"]          # ten sam kod co pc_plus_offset
+ADDR_ZP_INDIRECT = ADDR_SOURCE_CODES["zeropage_indirect"]
+ADDR_ZP_INDIRECT_INC = ADDR_SOURCE_CODES["zeropage_indirect_inc"]
+ADDR_ZP_X_POINTER = ADDR_SOURCE_CODES["calculate_zp_x_pointer"]
+ADDR_LATCH_INC = ADDR_SOURCE_CODES["latch_inc"]
+
+# Flagi wybierane przez bity 7..6 opkodu skoku warunkowego (BPL/BMI, BVC/BVS, BCC/BCS, BNE/BEQ)
+BRANCH_FLAGS = (FLAG_N, FLAG_V, FLAG_C, FLAG_Z)
+
+# Kolejność pól w zdekodowanym slocie (patrz decode_slot / MicrocodeExecutor.step)
+EXEC_FIELDS = (
+    "alu_op_key", "alu_flags_ld", "reg_out_key", "pch_out_en", "pcl_out_en",
+    "addr_out_bus_en", "addr_source_key", "x_add_to_addr_en", "y_add_to_addr_en",
+    "mem_read_en", "mem_write_en", "data_bus_in_en",
+    "reg_a_load_en", "reg_x_load_en", "reg_y_load_en", "reg_sp_load_en", "reg_p_load_en",
+    "adl_load_en", "adh_load_en", "tmp_load_en", "load_ir_en",
+    "pc_inc_en", "pc_load_en", "sp_int_inc_en", "sp_int_dec_en", "p_b_force_one_en", "alu_b_bus_en",
+)
+FLAG_SET_FIELDS = {"p_c_set_en": FLAG_C, "p_d_set_en": FLAG_D, "p_i_set_en": FLAG_I}
+FLAG_CLR_FIELDS = {"p_c_clr_en": FLAG_C, "p_d_clr_en": FLAG_D, "p_i_clr_en": FLAG_I, "p_v_clr_en": FLAG_V}
+SEQ_FIELDS = ("test_branch_en", "cpu_master_reset_en", "reset_cycle_counter_en", "skip_fetch_en")
+
+
+# ==============================================================================
+#  SEKCJA 2: ŁADOWANIE ROM
+# ==============================================================================
+def load_banks(build_dir=OUTPUT_DIR, num_banks=NUM_BANKS, plan=PACK_PLAN):
+    """Wczytuje pliki wYbX.rom i zwraca listę słów (w kolejności plan.word_names) indeksowaną slotem."""
+    banks = []
+    for word_name in plan.word_names:
+        word_banks = []
+        for bank in range(num_banks):
+            path = os.path.join(build_dir, f"{word_name}b{bank}.rom")
+            with open(path, "r") as f:
+                values = [int(line.strip(), 16) for line in f if line.strip()]
+            word_banks.append(values + [0] * (NUM_OPCODES - len(values)))
+        banks.append(word_banks)
+
+    return [tuple(word_banks[slot >> 8][slot & 0xFF] for word_banks in banks)
+            for slot in range(num_banks * NUM_OPCODES)]
+
+
+def assemble_rom(microcode_map, num_banks=NUM_BANKS, plan=PACK_PLAN):
+    """Składa ROM bezpośrednio z mapy mikrokodu (bez plików w katalogu build)."""
+    rom = [(0,) * len(plan.word_names)] * (num_banks * NUM_OPCODES)
+    for opcode, (_mnemonic, _addressing_mode, cycles) in microcode_map.items():
+        for cycle_index, symbolic_code in enumerate(cycles[:num_banks]):
+            rom[(cycle_index << 8) | opcode] = generate_microcode(symbolic_code, plan)
+    return rom
+
+
+def decode_slot(words, plan=PACK_PLAN):
+    """Zamienia słowa jednego slotu na krotkę pól w kolejności EXEC_FIELDS + maski flag + sekwencer."""
+    raw = dict(zip(plan.names, unpack_fields(words, plan)))
+    p_set = sum(bit for name, bit in FLAG_SET_FIELDS.items() if raw[name])
+    p_clr = sum(bit for name, bit in FLAG_CLR_FIELDS.items() if raw[name])
+    return tuple(raw[name] for name in EXEC_FIELDS) + (p_set, p_clr) + tuple(raw[name] for name in SEQ_FIELDS)
+
+
+# ==============================================================================
+#  SEKCJA 3: ALU
+# ==============================================================================
+def _nz(value):
+    return (value & FLAG_N) | (0 if value else FLAG_Z)
+
+
+def alu(op, a, b, carry):
+    """Zwraca (wynik, maska zmienianych flag, nowe bity flag)."""
+    if op == ALU_ADC:
+        s = a + b + carry
+        r = s & 0xFF
+        bits = _nz(r) | (FLAG_C if s > 0xFF else 0) | (FLAG_V if ~(a ^ b) & (a ^ r) & 0x80 else 0)
+        return r, FLAG_N | FLAG_V | FLAG_Z | FLAG_C, bits
+    if op == ALU_SBC:
+        s = a - b - (1 - carry)
+        r = s & 0xFF
+        bits = _nz(r) | (FLAG_C if s >= 0 else 0) | (FLAG_V if (a ^ b) & (a ^ r) & 0x80 else 0)
+        return r, FLAG_N | FLAG_V | FLAG_Z | FLAG_C, bits
+    if op == ALU_CMP:
+        r = (a - b) & 0xFF
+        return r, FLAG_N | FLAG_Z | FLAG_C, _nz(r) | (FLAG_C if a >= b else 0)
+    if op == ALU_BIT:
+        r = a & b
+        return r, FLAG_N | FLAG_V | FLAG_Z, (b & (FLAG_N | FLAG_V)) | (0 if r else FLAG_Z)
+    if op == ALU_ASL:
+        r = (b << 1) & 0xFF
+        return r, FLAG_N | FLAG_Z | FLAG_C, _nz(r) | (b >> 7)
+    if op == ALU_LSR:
+        r = b >> 1
+        return r, FLAG_N | FLAG_Z | FLAG_C, _nz(r) | (b & 1)
+    if op == ALU_ROL:
+        r = ((b << 1) | carry) & 0xFF
+        return r, FLAG_N | FLAG_Z | FLAG_C, _nz(r) | (b >> 7)
+    if op == ALU_ROR:
+        r = (b >> 1) | (carry << 7)
+        return r, FLAG_N | FLAG_Z | FLAG_C, _nz(r) | (b & 1)
+
+    if op == ALU_AND:
+        r = a & b
+    elif op == ALU_ORA:
+        r = a | b
+    elif op == ALU_XOR:
+        r = a ^ b
+    elif op == ALU_INC:
+        r = (b + 1) & 0xFF
+    elif op == ALU_DEC:
+        r = (b - 1) & 0xFF
+    else:
+        r = b
+    return r, FLAG_N | FLAG_Z, _nz(r)
+
+
+# ==============================================================================
+#  SEKCJA 4: WYKONAWCA
+# ==============================================================================
+class MicrocodeExecutor:
+    """Interpreter słów mikrokodu z 64 KiB pamięci płaskiej."""
+
+    def __init__(self, rom, memory=None):
+        self.rom = rom
+        self.slots = [decode_slot(words) for words in rom]
+        self.mem = bytearray(0x10000)
+        if memory is not None:
+            self.mem[:len(memory)] = memory
+        # Strony (256 B) zmienione od ostatniego snapshotu, patrz snapshot.SnapshotStore
+        self.dirty = bytearray(b"\x01" * 256)
+        # Opcjonalny licznik trafień slotów (array), patrz ucode_coverage.CoverageCollector
+        self.coverage = None
+        self.reset(pc=0)
+
+    def load(self, data, address):
+        if address < 0 or address + len(data) > len(self.mem):
+            raise ValueError(f"Program ({len(data)} B) pod ${address:04X} nie mieści się w 64 KiB pamięci.")
+        self.mem[address:address + len(data)] = data
+        for page in range(address >> 8, (address + len(data) + 0xFF) >> 8):
+            self.dirty[page & 0xFF] = 1
+
+    def reset(self, pc=None):
+        """Stan po RESET; bez podanego PC adres startu jest czytany z wektora 0xFFFC."""
+        if pc is None:
+            pc = self.mem[RESET_VECTOR] | (self.mem[RESET_VECTOR + 1] << 8)
+        self.a = self.x = self.y = 0
+        self.sp = 0xFD
+        self.p = FLAG_U | FLAG_I
+        self.pc = pc & 0xFFFF
+        self.ir = RESET_IR
+        self.t = 0
+        self.dl = self.tmp = self.adl = self.adh = 0
+        self.alu_result, self.alu_mask, self.alu_bits = 0, 0, 0
+        self.addr_bus = self.data_bus = 0
+        self.cycles = 0
+        self.instructions = 0
+        self.insn_pc = self.pc
+
+    def _address(self, source, x_add, y_add):
+        index = (self.x if x_add else 0) + (self.y if y_add else 0)
+        if source == ADDR_PC:
+            return (self.pc + index) & 0xFFFF
+        if source == ADDR_STACK:
+            return 0x0100 | ((self.sp + index) & 0xFF)
+        if source == ADDR_LATCH:
+            return (((self.adh << 8) | self.adl) + index) & 0xFFFF
+        if source == ADDR_ZEROPAGE:
+            return (self.adl + index) & 0xFF
+        if source == ADDR_ZP_INDIRECT:
+            return (self.dl + index) & 0xFF
+        if source == ADDR_ZP_INDIRECT_INC:
+            return (self.adl + 1 + index) & 0xFF
+        if source == ADDR_ZP_X_POINTER:
+            return (self.dl + self.x + index) & 0xFF
+        if source == ADDR_LATCH_INC:
+            return (((self.adh << 8) | self.adl) + 1 + index) & 0xFFFF
+        if source == ADDR_IRQ_LSB:
+            return 0xFFFE
+        if source == ADDR_IRQ_MSB:
+            return 0xFFFF
+        # Brak źródła adresu: szyna wystawia same zera (+ indeks)
+        return index
+
+    def step(self):
+        """Wykonuje jeden takt zegara."""
+        t = self.t
+        slot = (t << 8) | self.ir
+        if self.coverage is not None:
+            self.coverage[slot] += 1
+
+        (alu_op, flags_ld, reg_out, pch_out, pcl_out,
+         addr_out, addr_src, x_add, y_add,
+         mem_rd, mem_wr, bus_in,
+         a_ld, x_ld, y_ld, sp_ld, p_ld,
+         adl_ld, adh_ld, tmp_ld, ir_ld,
+         pc_inc, pc_ld, sp_inc, sp_dec, b_force, alu_b_bus,
+         p_set, p_clr,
+         test_branch, master_reset, end, skip_fetch) = self.slots[slot]
+
+        p = self.p
+        pc = self.pc
+
+        # Skok warunkowy: spełniony warunek blokuje END i sekwencer przechodzi do T2
+        taken = test_branch and bool(p & BRANCH_FLAGS[self.ir >> 6]) == bool(self.ir & 0x20)
+
+        # 1. Szyna adresowa i odczyt pamięci
+        addr = self._address(addr_src, x_add, y_add) if addr_out else self.addr_bus
+        data = self.mem[addr] if mem_rd else 0xFF
+
+        # 2. Operand na magistrali wewnętrznej
+        if reg_out:
+            if reg_out == REG_A:
+                operand = self.a
+            elif reg_out == REG_X:
+                operand = self.x
+            elif reg_out == REG_Y:
+                operand = self.y
+            elif reg_out == REG_SP:
+                operand = self.sp
+            elif reg_out == REG_P:
+                operand = p | FLAG_U | (FLAG_B if b_force else 0)
+            elif reg_out == REG_TMP:
+                operand = self.tmp
+            else:
+                operand = self.dl
+        elif pch_out:
+            operand = pc >> 8
+        elif pcl_out:
+            operand = pc & 0xFF
+        else:
+            operand = data
+
+        # 3. ALU
+        if alu_op == ALU_OUT:
+            value = self.alu_result
+            if flags_ld:
+                p = (p & ~self.alu_mask) | self.alu_bits
+        elif alu_op:
+            b = data if alu_b_bus else operand
+            self.alu_result, self.alu_mask, self.alu_bits = alu(alu_op, self.a, b, p & FLAG_C)
+            value = self.alu_result
+            if flags_ld:
+                p = (p & ~self.alu_mask) | self.alu_bits
+        else:
+            value = operand
+            if flags_ld:
+                p = (p & ~(FLAG_N | FLAG_Z)) | _nz(value)
+
+        # 4. Zbocze zegara: PC liczony z zatrzasków sprzed taktu
+        if pc_ld:
+            if addr_src == ADDR_ZEROPAGE:       # {pc_plus_offset}
+                pc = (pc + self.adl - ((self.adl & 0x80) << 1)) & 0xFFFF
+            else:                               # {ADH, ADL}
+                pc = (self.adh << 8) | self.adl
+        elif pc_inc:
+            pc = (pc + 1) & 0xFFFF
+
+        if mem_wr:
+            self.mem[addr] = value
+            self.dirty[addr >> 8] = 1
+            self.data_bus = value
+        elif mem_rd:
+            self.data_bus = data
+        self.addr_bus = addr
+
+        if a_ld:
+            self.a = value
+        if x_ld:
+            self.x = value
+        if y_ld:
+            self.y = value
+        if p_ld:
+            p = value | FLAG_U
+        if adl_ld:
+            self.adl = value
+        if adh_ld:
+            self.adh = value
+        if tmp_ld:
+            self.tmp = value
+        if mem_rd and bus_in:
+            self.dl = data
+        if ir_ld:
+            self.ir = data
+            self.insn_pc = addr
+            self.instructions += 1
+
+        sp = value if sp_ld else self.sp
+        if sp_inc:
+            sp = (sp + 1) & 0xFF
+        if sp_dec:
+            sp = (sp - 1) & 0xFF
+        self.sp = sp
+
+        self.p = (p | p_set) & ~p_clr
+        self.pc = pc
+        self.cycles += 1
+
+        if master_reset:
+            self.reset()
+        elif end and not taken:
+            self.t = 1 if skip_fetch else 0
+        else:
+            self.t = (t + 1) % NUM_BANKS
+
+    def run(self, cycles):
+        """Wykonuje zadaną liczbę taktów."""
+        step = self.step
+        for _ in range(cycles):
+            step()
+        return self.cycles
+
+    def registers(self):
+        return {"PC": self.pc, "A": self.a, "X": self.x, "Y": self.y, "SP": self.sp, "P": self.p,
+                "IR": self.ir, "T": self.t, "DL": self.dl, "TMP": self.tmp, "ADL": self.adl, "ADH": self.adh}
+
+
+def parse_int(text):
+    """Liczba dziesiętna, $HEX lub 0xHEX (argumenty CLI)."""
+    text = text.strip()
+    if text.startswith("$"):
+        return int(text[1:], 16)
+    return int(text, 0)
+
+
+# ==============================================================================
+#  SEKCJA 5: PROGRAMY KONTROLNE
+# ==============================================================================
+# (nazwa, adres ładowania, kod, liczba taktów, oczekiwane rejestry, oczekiwana pamięć).
+# Każdy program kończy się pułapką JMP *, której adres jest sprawdzany jako "insn_pc".
+SMOKE_PROGRAMS = [
+    ("LDA #, STA ZP, LDX #, DEX/BNE, JMP Abs", 0x0400,
+     bytes.fromhex("A942 8510 A205 CA D0FD 4C0C04 4C0C04"), 300,
+     {"A": 0x42, "X": 0x00, "P": FLAG_U | FLAG_I | FLAG_Z, "insn_pc": 0x040C},
+     {0x0010: 0x42}),
+    ("TAX/INX, CLC/ADC #, PHA/PLA, LDA ZP", 0x0400,
+     bytes.fromhex("A905 AA E8 18 6901 48 A900 68 8520 A900 A520 4C1104"), 300,
+     {"A": 0x06, "X": 0x06, "SP": 0xFD, "insn_pc": 0x0411},
+     {0x0020: 0x06, 0x01FD: 0x06}),
+]
+
+
+def run_smoke(rom, programs=SMOKE_PROGRAMS):
+    """Uruchamia programy kontrolne; zwraca listę (nazwa, opis rozbieżności lub None)."""
+    results = []
+    for name, address, code, cycles, registers, memory in programs:
+        executor = MicrocodeExecutor(rom)
+        executor.load(code, address)
+        executor.reset(address)
+        executor.run(cycles)
+
+        state = dict(executor.registers(), insn_pc=executor.insn_pc)
+        errors = [f"{reg}={state[reg]:02X} (oczekiwano {value:02X})"
+                  for reg, value in registers.items() if state[reg] != value]
+        errors += [f"${addr:04X}={executor.mem[addr]:02X} (oczekiwano {value:02X})"
+                   for addr, value in memory.items() if executor.mem[addr] != value]
+        results.append((name, ", ".join(errors) or None))
+    return results
+
+
+# ==============================================================================
+#  SEKCJA 6: MAIN
+# ==============================================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Wykonuje program 6502 na zasemblowanym mikrokodzie.")
+    parser.add_argument("program", nargs="?", help="plik binarny programu")
+    parser.add_argument("--smoke", action="store_true", help="uruchom programy kontrolne i sprawdź stan końcowy")
+    parser.add_argument("--load", type=parse_int, default=0x0000, help="adres ładowania (domyślnie $0000)")
+    parser.add_argument("--start", type=parse_int, default=None, help="adres startu (domyślnie wektor RESET)")
+    parser.add_argument("--cycles", type=int, default=1_000_000, help="liczba taktów do wykonania")
+    parser.add_argument("--build-dir", default=OUTPUT_DIR, help="katalog z plikami wYbX.rom")
+    parser.add_argument("--coverage", metavar="PLIK", help="zapisz pokrycie slotów mikrokodu do pliku JSON")
+    args = parser.parse_args()
+
+    if args.smoke:
+        failed = 0
+        for name, error in run_smoke(load_banks(args.build_dir)):
+            print(f"{'OK' if error is None else 'BŁĄD':<5} {name}" + (f": {error}" if error else ""))
+            failed += error is not None
+        sys.exit(1 if failed else 0)
+    if args.program is None:
+        parser.error("podaj plik programu albo --smoke")
+
+    executor = MicrocodeExecutor(load_banks(args.build_dir))
+    with open(args.program, "rb") as f:
+        executor.load(f.read(), args.load)
+    executor.reset(args.start)
+
+    collector = None
+    if args.coverage:
+        from ucode_coverage import CoverageCollector
+        collector = CoverageCollector()
+        collector.attach(executor)
+
+    start = time.perf_counter()
+    executor.run(args.cycles)
+    elapsed = time.perf_counter() - start
+
+    regs = " ".join(f"{name}={value:0{4 if name == 'PC' else 2}X}" for name, value in executor.registers().items())
+    print(f"Wykonano {executor.cycles} taktów ({executor.instructions} instrukcji) w {elapsed:.2f} s "
+          f"({executor.cycles / elapsed:,.0f} taktów/s).")
+    print(regs)
+
+    if collector:
+        collector.dump(args.coverage)
+        print(f"Zapisano pokrycie do {args.coverage}")
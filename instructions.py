@@ -153,7 +153,7 @@ def op_complex_rmw(cycles_addr, rmw_op, alu_op):
 MICROCODE_MAP = {
     # --- 1. SYSTEM ---
     0xEA: ("NOP", "Impl", FETCH + ["END"]),
-    0x00: ("BRK", "Impl", ["IR := *PC", "*SP := PCH; SP -= 1", "*SP := PCL; SP -= 1", "*SP := P; SETF(B); SP -= 1", "DL := *fCPL", "ADL := DL", "DL := *fCPH", "ADH := DL; PC := {ADH, ADL}; SETF(I); END"]),
+    0x00: ("BRK", "Impl", FETCH + ["DL := *PC; PC += 1", "*SP := PCH; SP -= 1", "*SP := PCL; SP -= 1", "*SP := P; SETF(B); SP -= 1", "ADH := *{irq_msb}", "ADL := *{irq_lsb}", "PC := {ADH, ADL}; SETF(I); END"]),
     0x18: ("CLC", "Impl", FETCH + ["CLRF(C); END"]),
     0x38: ("SEC", "Impl", FETCH + ["SETF(C); END"]),
     0x58: ("CLI", "Impl", FETCH + ["CLRF(I); END"]),
@@ -163,9 +163,12 @@ MICROCODE_MAP = {
     0xF8: ("SED", "Impl", FETCH + ["SETF(D); END"]),
 
     # --- 2. SKOKI ---
-    0x4C: ("JMP", "Abs", FETCH + ["DL := *PC; PC += 1; ADL := DL", "DL := *PC; PC += 1; ADH := DL", "PC := {ADH, ADL}; END"]),
-    0x6C: ("JMP", "Ind", FETCH + ["DL := *PC; PC += 1; ADL := DL", "DL := *PC; PC += 1; ADH := DL", "DL := *{latch}; ADL := DL", "DL := *{latch_inc}; ADH := DL", "PC := {ADH, ADL}; END"]),
-    0x20: ("JSR", "Abs", FETCH + ["DL := *PC; PC += 1; ADL := DL", "*SP := PCH; SP -= 1", "*SP := PCL; SP -= 1", "DL := *PC; ADH := DL", "PC := {ADH, ADL}; END"]),
+    # DL to D-FlipFlop: "ADL := DL" w takcie "DL := *PC" zatrzasnąłby poprzednią zawartość DL
+    # (na tym opiera się c_abs()). Bajty adresu idą więc z szyny danych prosto do ADL/ADH,
+    # tak jak "ADL := *PC" w c_branch().
+    0x4C: ("JMP", "Abs", FETCH + ["ADL := *PC; PC += 1", "ADH := *PC; PC += 1", "PC := {ADH, ADL}; END"]),
+    0x6C: ("JMP", "Ind", FETCH + ["ADL := *PC; PC += 1", "ADH := *PC; PC += 1", "TMP := *{latch}", "ADH := *{latch_inc}", "ADL := TMP", "PC := {ADH, ADL}; END"]),
+    0x20: ("JSR", "Abs", FETCH + ["ADL := *PC; PC += 1", "*SP := PCH; SP -= 1", "*SP := PCL; SP -= 1", "ADH := *PC", "PC := {ADH, ADL}; END"]),
     0x60: ("RTS", "Impl", FETCH + ["SP += 1", "DL := *SP; PCL := DL", "SP += 1", "DL := *SP; PCH := DL", "PC += 1; END"]),
     0x40: ("RTI", "Impl", FETCH + ["SP += 1", "DL := *SP; P := DL", "SP += 1", "DL := *SP; PCL := DL", "SP += 1", "DL := *SP; PCH := DL", "END"]),
 
@@ -190,7 +193,8 @@ MICROCODE_MAP = {
     # --- 4. STOS ---
     0x48: ("PHA", "Impl", FETCH + ["*SP := A; SP -= 1; END"]),
     0x08: ("PHP", "Impl", FETCH + ["*SP := P; SETF(B); SP -= 1; END"]),
-    0x68: ("PLA", "Impl", FETCH + ["SP += 1", "DL := *SP", "A := DL; PASS(A); ALU_FLAGS_LD; END"]),
+    # Słowo ma jedno pole REG_OUT, więc "A := DL; PASS(A)" dawało A := A - ładowanie jak w LDA #Imm
+    0x68: ("PLA", "Impl", FETCH + ["SP += 1", "DL := *SP", "PASS(DL); A := ALU_RESULT; ALU_FLAGS_LD; END"]),
     0x28: ("PLP", "Impl", FETCH + ["SP += 1", "DL := *SP", "P := DL; END"]),
 
     # --- 5. LOAD/STORE ---
@@ -1,9 +1,14 @@
 # burner.py
 # -*- coding: utf-8 -*-
 
+import argparse
 import json
 import os
 import re
+import stat
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # ==============================================================================
 #  KONFIGURACJA
@@ -14,92 +19,187 @@ import re
 PLA_FILE = os.path.join("..", "MOS8502-dls-core", "dls", "Chips", "PLA.json")
 BUILD_DIR = "build"
 
+# Lista wszystkich 24 oczekiwanych etykiet dla weryfikacji (w0..w2 x b0..b7)
+EXPECTED_LABELS = {f'w{y}b{x}' for y in range(3) for x in range(8)}
 
-def inject_rom_data_to_pla():
+# Liczba równoległych wątków przy wsadowym przepalaniu wielu plików
+DEFAULT_JOBS = min(8, os.cpu_count() or 1)
+
+
+def read_rom_file(path):
+    """Wczytuje plik wsadu ROM (HEX, jedna wartość na linię) jako listę INT."""
+    with open(path, 'r') as f:
+        return [int(line.strip(), 16) for line in f if line.strip()]
+
+
+def load_rom_images(build_dir=BUILD_DIR, label_map=None):
     """
-    Wczytuje skompilowane pliki wsadów z katalogu BUILD_DIR (wYbX.txt)
-    i aktualizuje komponenty ROM w PLA.json na podstawie ich etykiet (wYbX).
+    Wczytuje wsady z katalogu build_dir (wYbX.rom) oraz z jawnych przypisań
+    etykieta -> plik. Zwraca słownik {etykieta: [INT, ...]}.
     """
+    rom_images = {}
 
-    print("\n--- URUCHAMIANIE WIRTUALNEJ WYPALARKI ROM (PLA INJECTION) ---")
+    if build_dir and os.path.isdir(build_dir):
+        for filename in sorted(os.listdir(build_dir)):
+            # Regex dopasowuje w[cyfra]b[cyfra].rom
+            match = re.match(r'(w\d+b\d+)\.rom$', filename)
+            if match:
+                rom_images[match.group(1)] = read_rom_file(os.path.join(build_dir, filename))
+
+    # Jawne przypisania nadpisują pliki z katalogu build
+    for label, path in (label_map or {}).items():
+        rom_images[label] = read_rom_file(path)
+
+    return rom_images
+
+
+def write_json_atomic(path, data):
+    """Zapisuje JSON do pliku tymczasowego obok celu i podmienia go atomowo."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".pla-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            # Używamy indent=2 dla lepszej czytelności w DLS
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp tworzy plik 0600 - zachowujemy uprawnienia podmienianego pliku
+        if os.path.exists(path):
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def inject_into_file(pla_file, rom_images, expected_labels=EXPECTED_LABELS):
+    """
+    Przepala wsady do komponentów ROM jednego pliku PLA.json.
+    Plik jest zapisywany tylko wtedy, gdy InternalData któregoś ROM-u się zmieniło.
+    Zwraca podsumowanie: zmienione / niezmienione / brakujące etykiety i czas.
+    """
+    start = time.perf_counter()
+    summary = {"file": pla_file, "changed": [], "unchanged": [], "missing": [],
+               "written": False, "error": None, "time": 0.0}
 
     try:
-        # Wczytaj PLA.json
-        with open(PLA_FILE, 'r', encoding='utf-8') as f:
+        with open(pla_file, 'r', encoding='utf-8') as f:
             pla_data = json.load(f)
+
+        # Mapa etykiet dla szybkiego dostępu
+        component_map = {}
+        for component in pla_data.get("SubChips", []):
+            label = component.get("Label", "")
+            if label:
+                component_map[label] = component
+
+        for label, int_data in sorted(rom_images.items()):
+            component = component_map.get(label)
+            if component is None:
+                continue
+            if component.get("InternalData") == int_data:
+                summary["unchanged"].append(label)
+            else:
+                component["InternalData"] = list(int_data)
+                summary["changed"].append(label)
+
+        found_labels = set(summary["changed"]) | set(summary["unchanged"])
+        summary["missing"] = sorted((set(expected_labels) | set(rom_images)) - found_labels)
+
+        if summary["changed"]:
+            write_json_atomic(pla_file, pla_data)
+            summary["written"] = True
     except Exception as e:
-        print(f"❌ BŁĄD: Nie można wczytać pliku {PLA_FILE}. Sprawdź ścieżkę: {os.path.abspath(PLA_FILE)}. Detale: {e}")
+        summary["error"] = str(e)
+
+    summary["time"] = time.perf_counter() - start
+    return summary
+
+
+def print_summary(summary):
+    pla_file = summary["file"]
+    if summary["error"]:
+        print(f"❌ BŁĄD: {pla_file}: {summary['error']} (ścieżka: {os.path.abspath(pla_file)})")
         return
 
+    status = "ZAPISANO" if summary["written"] else "BEZ ZMIAN, pominięto zapis"
+    print(f"✅ {pla_file}: {status} "
+          f"(zmienione: {len(summary['changed'])}, niezmienione: {len(summary['unchanged'])}, "
+          f"brakujące: {len(summary['missing'])}, czas: {summary['time'] * 1000:.1f} ms)")
+    if summary["changed"]:
+        print(f"   Przepalono: {', '.join(summary['changed'])}")
+    if summary["missing"]:
+        print(f"   ⚠️ BRAKUJĄCE ETYKIETY: {', '.join(summary['missing'])}")
+
+
+def inject_rom_data_batch(pla_files, rom_images, jobs=DEFAULT_JOBS):
+    """Przepala te same wsady do wielu plików PLA.json równolegle (pula wątków)."""
+    print(f"\n--- WSADOWE PRZEPALANIE: {len(pla_files)} plików, {len(rom_images)} ROM-ów, {jobs} wątków ---")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        summaries = list(pool.map(lambda path: inject_into_file(path, rom_images), pla_files))
+
+    for summary in summaries:
+        print_summary(summary)
+
+    written = sum(1 for s in summaries if s["written"])
+    failed = sum(1 for s in summaries if s["error"])
+    print(f"\n--- ZAPISANO {written}/{len(summaries)} plików, błędy: {failed}, "
+          f"łączny czas: {(time.perf_counter() - start) * 1000:.1f} ms ---\n")
+    return summaries
+
+
+def inject_rom_data_to_pla():
+    """
+    Wczytuje skompilowane pliki wsadów z katalogu BUILD_DIR (wYbX.rom)
+    i aktualizuje komponenty ROM w PLA.json na podstawie ich etykiet (wYbX).
+    """
+
+    print("\n--- URUCHAMIANIE WIRTUALNEJ WYPALARKI ROM (PLA INJECTION) ---")
+
     # Jeśli katalog build nie istnieje, przerywamy
     if not os.path.isdir(BUILD_DIR):
         print(f"❌ BŁĄD: Nie znaleziono katalogu {BUILD_DIR}. Uruchom najpierw ucode.py.")
         return
 
-    rom_files = os.listdir(BUILD_DIR)
-    injected_count = 0
-
-    # 1. Tworzenie mapy etykiet dla szybkiego dostępu
-    component_map = {}
-    for component in pla_data.get("SubChips", []):
-        label = component.get("Label", "")
-        if label:
-            component_map[label] = component
-
-    # Lista wszystkich 24 oczekiwanych etykiet dla weryfikacji (w0..w2 x b0..b7)
-    expected_labels = {f'w{y}b{x}' for y in range(3) for x in range(8)}
-    found_labels = set()
-
-    # 2. Iteruj przez pliki w katalogu 'build'
-    for filename in rom_files:
-        # Regex dopasowuje w[cyfra]b[cyfra].rom
-        match = re.match(r'(w\d+b\d+)\.rom$', filename)
-
-        if match:
-            # Etykieta to część nazwy pliku BEZ rozszerzenia '.txt'
-            component_label_to_match = match.group(1)
-
-            if component_label_to_match in component_map:
-                txt_path = os.path.join(BUILD_DIR, filename)
-                component = component_map[component_label_to_match]
-
-                try:
-                    # 3. Wczytaj zawartość pliku TXT (HEX -> INT)
-                    with open(txt_path, 'r') as f:
-                        hex_values = [line.strip() for line in f if line.strip()]
-                        # Konwersja na INT z bazy 16 (HEX)
-                        int_data = [int(v, 16) for v in hex_values]
-
-                    # 4. Wstrzyknij dane do InternalData (przepalanie)
-                    component["InternalData"] = int_data
-                    print(f"✅ SUCCESS: Przepalono '{component_label_to_match}' (plik: {filename}).")
-                    injected_count += 1
-                    found_labels.add(component_label_to_match)
-
-                except Exception as e:
-                    print(f"❌ BŁĄD PRZY ZAPISIE DANYCH dla etykiety '{component_label_to_match}': {e}")
-            else:
-                print(
-                    f"⚠️ OSTRZEŻENIE: Nie znaleziono KOMPONENTU z etykietą '{component_label_to_match}' w {PLA_FILE}. Pominięto.")
+    rom_images = load_rom_images(BUILD_DIR)
+    if not rom_images:
+        print("\n--- NIE ZNALEZIONO PASUJĄCYCH PLIKÓW MIKROKODU DO WSTRZYKNIĘCIA. --- \n")
+        return
 
-    # 5. Weryfikacja i Zapis
-    missing_labels = expected_labels - found_labels
-    if missing_labels:
-        print(f"\n🛑 UWAGA: Wstrzyknięto dane tylko do {injected_count}/{len(expected_labels)} ROM-ów.")
-        print(
-            f"   BRAKUJĄCE ETYKIETY (sprawdź {PLA_FILE} lub folder {BUILD_DIR}): {', '.join(sorted(list(missing_labels)))}")
+    inject_rom_data_batch([PLA_FILE], rom_images, jobs=1)
 
-    if injected_count > 0:
-        try:
-            with open(PLA_FILE, 'w', encoding='utf-8') as f:
-                # Używamy indent=2 dla lepszej czytelności w DLS
-                json.dump(pla_data, f, indent=2)
-            print(f"\n--- ZAPISANO NOWY {PLA_FILE} pomyślnie. ---\n")
-        except Exception as e:
-            print(f"❌ BŁĄD: Nie można zapisać pliku {PLA_FILE}: {e}")
-    else:
-        print("\n--- NIE ZNALEZIONO PASUJĄCYCH PLIKÓW MIKROKODU DO WSTRZYKNIĘCIA. --- \n")
+
+def parse_label_map(entries):
+    """Parsuje przypisania w postaci 'w0b3=sciezka/do/pliku.rom'."""
+    label_map = {}
+    for entry in entries:
+        label, sep, path = entry.partition('=')
+        if not sep or not re.match(r'w\d+b\d+$', label.strip()):
+            raise argparse.ArgumentTypeError(f"Niepoprawne przypisanie '{entry}' (oczekiwano wYbX=plik.rom)")
+        label_map[label.strip()] = path.strip()
+    return label_map
 
 
 if __name__ == "__main__":
-    inject_rom_data_to_pla()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Wirtualna wypalarka ROM: wstrzykuje wsady mikrokodu do plików PLA.json.")
+    parser.add_argument("targets", nargs="*", help=f"pliki PLA.json (domyślnie {PLA_FILE})")
+    parser.add_argument("--build-dir", default=BUILD_DIR, help="katalog z plikami wYbX.rom")
+    parser.add_argument("--map", action="append", default=[], metavar="wYbX=PLIK",
+                        help="jawne przypisanie etykiety do pliku ROM (można podać wielokrotnie)")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="liczba równoległych wątków")
+    args = parser.parse_args()
+
+    if not args.targets and not args.map and args.build_dir == BUILD_DIR:
+        inject_rom_data_to_pla()
+    else:
+        try:
+            images = load_rom_images(args.build_dir, parse_label_map(args.map))
+        except (OSError, ValueError, argparse.ArgumentTypeError) as e:
+            parser.error(str(e))
+        if not images:
+            print("\n--- NIE ZNALEZIONO PASUJĄCYCH PLIKÓW MIKROKODU DO WSTRZYKNIĘCIA. --- \n")
+        else:
+            inject_rom_data_batch(args.targets or [PLA_FILE], images, args.jobs)
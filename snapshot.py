@@ -0,0 +1,295 @@
+# snapshot.py
+# -*- coding: utf-8 -*-
+# Snapshoty stanu wykonawcy mikrokodu: zapis co N taktów, odtwarzanie,
+# przewijanie do dowolnego taktu i bisekcja do pierwszej rozbieżności
+# z referencyjnym śladem (np. z emulatora 6502).
+#
+# Pamięć 64 KiB jest dzielona na 256 stron po 256 B. Snapshot trzyma krotkę
+# niezmiennych stron (bytes); strony, których nikt nie zapisał od poprzedniego
+# snapshotu (executor.dirty), są współdzielone (copy-on-write), więc kolejne
+# snapshoty kosztują tylko zmienione strony.
+
+import argparse
+import bisect
+import csv
+import struct
+import zlib
+from collections import namedtuple
+
+from executor import MicrocodeExecutor, load_banks, parse_int
+from ucode import OUTPUT_DIR, PACK_PLAN
+
+PAGE_SIZE = 256
+NUM_PAGES = 256
+
+# Stan wykonawcy poza pamięcią: (atrybut, kod struct)
+STATE_FIELDS = (
+    ("cycles", "Q"), ("instructions", "Q"),
+    ("pc", "H"), ("insn_pc", "H"), ("addr_bus", "H"),
+    ("a", "B"), ("x", "B"), ("y", "B"), ("sp", "B"), ("p", "B"),
+    ("ir", "B"), ("t", "B"), ("dl", "B"), ("tmp", "B"), ("adl", "B"), ("adh", "B"),
+    ("alu_result", "B"), ("alu_mask", "B"), ("alu_bits", "B"), ("data_bus", "B"),
+)
+STATE_STRUCT = struct.Struct("<" + "".join(code for _name, code in STATE_FIELDS))
+
+SNAPSHOT_MAGIC = b"U8502SNP"
+SNAPSHOT_VERSION = 1
+HEADER_STRUCT = struct.Struct("<HIIII")      # wersja, interwał, CRC ROM, liczba stron, liczba snapshotów
+
+Snapshot = namedtuple("Snapshot", ["state", "pages"])
+_CYCLES, _INSTRUCTIONS = 0, 1                # pozycje w Snapshot.state (patrz STATE_FIELDS)
+
+
+def rom_crc(rom, plan=PACK_PLAN):
+    """Suma kontrolna ROM - snapshot pasuje tylko do mikrokodu, z którym go zrobiono."""
+    size = (plan.word_width + 7) // 8
+    return zlib.crc32(b"".join(value.to_bytes(size, "little") for words in rom for value in words))
+
+
+class SnapshotStore:
+    """Snapshoty co `interval` taktów, posortowane rosnąco po takcie."""
+
+    def __init__(self, interval, crc=0):
+        if interval < 1:
+            raise ValueError(f"Interwał snapshotów musi być >= 1 (podano {interval}).")
+        self.interval = interval
+        self.crc = crc
+        self.snapshots = []
+        self.cycles = []
+        self.instructions = []              # licznik instrukcji każdego snapshotu (rosnąco, jak cycles)
+        self._base = None                   # strony, z których wywodzi się bieżąca pamięć
+
+    def take(self, executor):
+        mem, dirty = executor.mem, executor.dirty
+        base = self._base
+        if base is None:
+            pages = tuple(bytes(mem[p * PAGE_SIZE:(p + 1) * PAGE_SIZE]) for p in range(NUM_PAGES))
+        else:
+            pages = tuple(bytes(mem[p * PAGE_SIZE:(p + 1) * PAGE_SIZE]) if dirty[p] else base[p]
+                          for p in range(NUM_PAGES))
+        dirty[:] = bytes(NUM_PAGES)
+        self._base = pages
+
+        snap = Snapshot(tuple(getattr(executor, name) for name, _code in STATE_FIELDS), pages)
+        cycle = executor.cycles
+        i = bisect.bisect_left(self.cycles, cycle)
+        if i < len(self.cycles) and self.cycles[i] == cycle:
+            self.snapshots[i] = snap
+            self.instructions[i] = executor.instructions
+        else:
+            self.cycles.insert(i, cycle)
+            self.instructions.insert(i, executor.instructions)
+            self.snapshots.insert(i, snap)
+        return snap
+
+    def nearest(self, cycle):
+        """Ostatni snapshot zrobiony nie później niż `cycle`."""
+        i = bisect.bisect_right(self.cycles, cycle) - 1
+        if i < 0:
+            raise ValueError(f"Brak snapshotu dla taktu {cycle}.")
+        return self.snapshots[i]
+
+    def nearest_instruction(self, count):
+        """Ostatni snapshot sprzed pobrania opkodu instrukcji nr `count`."""
+        i = bisect.bisect_left(self.instructions, count) - 1
+        if i < 0:
+            raise ValueError(f"Brak snapshotu dla instrukcji {count}.")
+        return self.snapshots[i]
+
+    def restore(self, executor, snap):
+        for (name, _code), value in zip(STATE_FIELDS, snap.state):
+            setattr(executor, name, value)
+        executor.mem[:] = b"".join(snap.pages)
+        executor.dirty[:] = bytes(NUM_PAGES)
+        self._base = snap.pages
+
+    # --- Serializacja: unikalne strony zapisane raz, całość skompresowana zlib ---
+    def save(self, path):
+        page_ids, pool = {}, []
+        body = []
+        for snap in self.snapshots:
+            indices = []
+            for page in snap.pages:
+                if page not in page_ids:
+                    page_ids[page] = len(pool)
+                    pool.append(page)
+                indices.append(page_ids[page])
+            body.append(STATE_STRUCT.pack(*snap.state) + struct.pack(f"<{NUM_PAGES}I", *indices))
+
+        payload = HEADER_STRUCT.pack(SNAPSHOT_VERSION, self.interval, self.crc, len(pool), len(self.snapshots))
+        payload += b"".join(pool) + b"".join(body)
+        with open(path, "wb") as f:
+            f.write(SNAPSHOT_MAGIC + zlib.compress(payload, 6))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            raw = f.read()
+        if not raw.startswith(SNAPSHOT_MAGIC):
+            raise ValueError(f"{path}: to nie jest plik snapshotów mikrokodu.")
+        payload = zlib.decompress(raw[len(SNAPSHOT_MAGIC):])
+
+        version, interval, crc, n_pages, n_snaps = HEADER_STRUCT.unpack_from(payload, 0)
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"{path}: nieobsługiwana wersja {version}.")
+        offset = HEADER_STRUCT.size
+        pool = [payload[offset + i * PAGE_SIZE:offset + (i + 1) * PAGE_SIZE] for i in range(n_pages)]
+        offset += n_pages * PAGE_SIZE
+
+        store = cls(interval, crc)
+        index_struct = struct.Struct(f"<{NUM_PAGES}I")
+        for _ in range(n_snaps):
+            state = STATE_STRUCT.unpack_from(payload, offset)
+            offset += STATE_STRUCT.size
+            pages = tuple(pool[i] for i in index_struct.unpack_from(payload, offset))
+            offset += index_struct.size
+            store.cycles.append(state[_CYCLES])
+            store.instructions.append(state[_INSTRUCTIONS])
+            store.snapshots.append(Snapshot(state, pages))
+        return store
+
+
+# ==============================================================================
+#  NAGRYWANIE, PRZEWIJANIE, BISEKCJA
+# ==============================================================================
+def record(executor, cycles, store):
+    """Wykonuje `cycles` taktów, robiąc snapshot na każdej wielokrotności interwału."""
+    target = executor.cycles + cycles
+    interval = store.interval
+    while True:
+        if executor.cycles % interval == 0:
+            store.take(executor)
+        if executor.cycles >= target:
+            break
+        executor.run(min(target, (executor.cycles // interval + 1) * interval) - executor.cycles)
+    return store
+
+
+def seek(executor, store, cycle):
+    """Przewija wykonawcę do taktu `cycle` (najbliższy snapshot + dowykonanie)."""
+    store.restore(executor, store.nearest(cycle))
+    executor.run(cycle - executor.cycles)
+
+
+def seek_instruction(executor, store, count):
+    """Przewija do chwili tuż po pobraniu opkodu instrukcji nr `count` (licząc od 1)."""
+    store.restore(executor, store.nearest_instruction(count))
+    step = executor.step
+    while executor.instructions < count:
+        step()
+
+
+def load_reference(path):
+    """
+    Ślad referencyjny CSV z nagłówkiem, np. 'cycle,PC,A,X,Y,SP,P' albo 'insn,PC,A,...'.
+    Wartości rejestrów szesnastkowo ($ opcjonalny), takt/instrukcja dziesiętnie.
+    """
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        key = "cycle" if "cycle" in reader.fieldnames else "insn"
+        records = []
+        for row in reader:
+            values = {name.upper(): int(value.strip().lstrip("$"), 16)
+                      for name, value in row.items() if name != key and value is not None and value.strip()}
+            records.append((int(row[key]), values))
+    records.sort(key=lambda record_: record_[0])
+    return key, records
+
+
+def _compare(executor, key, expected):
+    registers = executor.registers()
+    if key == "insn":
+        registers["PC"] = executor.insn_pc      # PC instrukcji, a nie PC po pobraniu opkodu
+    return {name: (registers.get(name), value) for name, value in expected.items() if registers.get(name) != value}
+
+
+def find_divergence(executor, store, key, records):
+    """
+    Bisekcja po rekordach śladu: zwraca (pozycja, różnice) pierwszego rekordu,
+    który nie zgadza się z wykonaniem mikrokodu, albo None, gdy ślady są zgodne.
+    Zakłada, że raz rozbieżne wykonanie już się nie "naprawia".
+    """
+    position = seek_instruction if key == "insn" else seek
+
+    def diverged(i):
+        at, expected = records[i]
+        position(executor, store, at)
+        return _compare(executor, key, expected)
+
+    lo, hi = 0, len(records)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if diverged(mid):
+            hi = mid
+        else:
+            lo = mid + 1
+
+    if lo == len(records):
+        return None
+    return records[lo][0], diverged(lo)
+
+
+def positive_int(text):
+    """Liczba całkowita >= 1 (argumenty CLI)."""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"wymagana liczba >= 1, podano {value}")
+    return value
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snapshoty, przewijanie i bisekcja rozbieżności wykonania mikrokodu.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    record_cmd = sub.add_parser("record", help="wykonaj program, zapisując snapshot co N taktów")
+    record_cmd.add_argument("program", help="plik binarny programu")
+    record_cmd.add_argument("-o", "--output", default="snapshots.bin", help="plik snapshotów")
+    record_cmd.add_argument("--load", type=parse_int, default=0x0000, help="adres ładowania (domyślnie $0000)")
+    record_cmd.add_argument("--start", type=parse_int, default=None, help="adres startu (domyślnie wektor RESET)")
+    record_cmd.add_argument("--cycles", type=int, default=10_000_000, help="liczba taktów")
+    record_cmd.add_argument("--interval", type=positive_int, default=100_000, help="odstęp między snapshotami (takty)")
+
+    bisect_cmd = sub.add_parser("bisect", help="znajdź pierwszy takt/instrukcję niezgodną ze śladem referencyjnym")
+    bisect_cmd.add_argument("snapshots", help="plik snapshotów z polecenia record")
+    bisect_cmd.add_argument("reference", help="ślad referencyjny CSV")
+    bisect_cmd.add_argument("--vcd", help="zapisz przebiegi wokół rozbieżności do pliku VCD")
+    bisect_cmd.add_argument("--window", type=int, default=200, help="liczba taktów przed rozbieżnością w VCD")
+
+    for cmd in (record_cmd, bisect_cmd):
+        cmd.add_argument("--build-dir", default=OUTPUT_DIR, help="katalog z plikami wYbX.rom")
+    args = parser.parse_args()
+
+    banks = load_banks(args.build_dir)
+    executor = MicrocodeExecutor(banks)
+
+    if args.command == "record":
+        with open(args.program, "rb") as f:
+            executor.load(f.read(), args.load)
+        executor.reset(args.start)
+        snapshot_store = record(executor, args.cycles, SnapshotStore(args.interval, rom_crc(banks)))
+        snapshot_store.save(args.output)
+        print(f"Zapisano {len(snapshot_store.snapshots)} snapshotów (co {args.interval} taktów) do {args.output}.")
+    else:
+        snapshot_store = SnapshotStore.load(args.snapshots)
+        if snapshot_store.crc != rom_crc(banks):
+            print("UWAGA: snapshoty zrobiono na innym mikrokodzie niż bieżące pliki ROM.")
+        ref_key, ref_records = load_reference(args.reference)
+        found = find_divergence(executor, snapshot_store, ref_key, ref_records)
+        if found is None:
+            print(f"Brak rozbieżności w {len(ref_records)} rekordach śladu.")
+        else:
+            at, differences = found
+            if ref_key == "insn":
+                print(f"Pierwsza rozbieżność: instrukcja {at} (takt {executor.cycles}).")
+            else:
+                print(f"Pierwsza rozbieżność: takt {at}.")
+            for name, (actual, expected) in differences.items():
+                width = 4 if name == "PC" else 2
+                shown = "-" if actual is None else f"{actual:0{width}X}"
+                print(f"  {name}: mikrokod={shown} referencja={expected:0{width}X}")
+            if args.vcd:
+                from vcd_trace import trace_execution
+                divergence_cycle = executor.cycles
+                seek(executor, snapshot_store, max(0, divergence_cycle - args.window))
+                trace_execution(executor, args.vcd, divergence_cycle - executor.cycles + 1)
+                print(f"Zapisano przebiegi wokół rozbieżności do {args.vcd}.")
@@ -3,9 +3,11 @@
 
 import csv
 import os
+import sys
+from collections import namedtuple
 
 try:
-    from instructions import MICROCODE_MAP
+    from instructions import FETCH, MICROCODE_MAP
 except ImportError:
     print("BŁĄD: Nie znaleziono pliku 'instructions.py'.")
     print("Upewnij się, że plik z definicjami instrukcji znajduje się w tym samym folderze.")
@@ -14,6 +16,12 @@ except ImportError:
 # Konfiguracja folderu wyjściowego
 OUTPUT_DIR = "build"
 
+# Nakładanie FETCH następnej instrukcji na ostatni cykl bieżącej (fetch/execute overlap).
+# Wymaga sprzętowej obsługi bitu W0.5 (SKIP_FETCH): reset licznika cykli do T1 zamiast T0.
+# IR jest ładowany jawnie bitem LOAD_IR_EN, który scalony cykl dziedziczy z FETCH.
+# Można też włączyć jednorazowo flagą: python ucode.py --overlap
+FETCH_OVERLAP = False
+
 # ==============================================================================
 #  SEKCJA 1: DEFINICJE KODÓW STERUJĄCYCH
 # ==============================================================================
@@ -21,7 +29,8 @@ ALU_OP_CODES = {
     "none": 0b0000, "adc": 0b0001, "sbc": 0b0010, "and": 0b0011,
     "ora": 0b0100, "xor": 0b0101, "bit": 0b0110, "cmp": 0b0111,
     "asl": 0b1000, "lsr": 0b1001, "rol": 0b1010, "ror": 0b1011,
-    "inc": 0b1100, "dec": 0b1101, "pass": 0b1110, "out": 0b1111
+    "inc": 0b1100, "dec": 0b1101, "pass": 0b1110, "out": 0b1111,
+    "eor": 0b0101  # mnemonik 6502 dla xor
 }
 
 REG_OUT_CODES = {
@@ -44,31 +53,185 @@ ADDR_SOURCE_CODES = {
     "latch_inc": 0b1100
 }
 
+# ==============================================================================
+#  SEKCJA 1A: UKŁAD SŁÓW STERUJĄCYCH (SPECYFIKACJA)
+# ==============================================================================
+# Jedyne źródło prawdy o rozmieszczeniu sygnałów w W2/W1/W0:
+# (sygnał, słowo, bit początkowy, szerokość, tablica wartości lub None dla flag 1-bitowych).
+# Z tej specyfikacji powstaje plan pakowania, dekoder i dokumentacja układu.
+WORD_NAMES = ("w2", "w1", "w0")
+WORD_WIDTH = 16
+
+CONTROL_WORD_LAYOUT = [
+    # --- W2: ALU, rejestry, PC ---
+    ("alu_flags_ld",           "w2", 15, 1, None),
+    ("alu_op_key",             "w2", 11, 4, ALU_OP_CODES),
+    ("reg_a_load_en",          "w2", 10, 1, None),
+    ("reg_x_load_en",          "w2",  9, 1, None),
+    ("reg_y_load_en",          "w2",  8, 1, None),
+    ("reg_sp_load_en",         "w2",  7, 1, None),
+    ("reg_p_load_en",          "w2",  6, 1, None),
+    ("reg_out_key",            "w2",  3, 3, REG_OUT_CODES),
+    ("pc_inc_en",              "w2",  2, 1, None),
+    ("pc_load_en",             "w2",  1, 1, None),
+    ("pc_out_addr_en",         "w2",  0, 1, None),
+    # --- W1: adresowanie i magistrala ---
+    ("addr_source_key",        "w1", 12, 4, ADDR_SOURCE_CODES),
+    ("adh_load_en",            "w1", 11, 1, None),
+    ("adl_load_en",            "w1", 10, 1, None),
+    ("x_add_to_addr_en",       "w1",  9, 1, None),
+    ("y_add_to_addr_en",       "w1",  8, 1, None),
+    ("pch_out_en",             "w1",  7, 1, None),
+    ("pcl_out_en",             "w1",  6, 1, None),
+    ("sp_int_inc_en",          "w1",  5, 1, None),
+    ("sp_int_dec_en",          "w1",  4, 1, None),
+    ("mem_read_en",            "w1",  3, 1, None),
+    ("mem_write_en",           "w1",  2, 1, None),
+    ("data_bus_in_en",         "w1",  1, 1, None),
+    ("data_bus_out_en",        "w1",  0, 1, None),
+    # --- W0: flagi P, sekwencer ---
+    ("p_b_force_one_en",       "w0", 15, 1, None),
+    ("p_c_set_en",             "w0", 14, 1, None),
+    ("p_c_clr_en",             "w0", 13, 1, None),
+    ("p_d_set_en",             "w0", 12, 1, None),
+    ("p_d_clr_en",             "w0", 11, 1, None),
+    ("p_i_set_en",             "w0", 10, 1, None),
+    ("p_i_clr_en",             "w0",  9, 1, None),
+    ("p_v_clr_en",             "w0",  8, 1, None),
+    ("tmp_load_en",            "w0",  7, 1, None),
+    ("alu_b_bus_en",           "w0",  6, 1, None),
+    ("skip_fetch_en",          "w0",  5, 1, None),
+    ("addr_out_bus_en",        "w0",  4, 1, None),
+    ("test_branch_en",         "w0",  3, 1, None),
+    ("cpu_master_reset_en",    "w0",  2, 1, None),
+    ("reset_cycle_counter_en", "w0",  1, 1, None),
+    ("load_ir_en",             "w0",  0, 1, None),
+]
+
+# Skompilowany plan pakowania: płaskie krotki indeksowane numerem sygnału.
+PackPlan = namedtuple("PackPlan", [
+    "word_names", "word_width", "names", "index",
+    "word", "shift", "mask", "encode", "decode"
+])
+
+
+def compile_layout(layout=CONTROL_WORD_LAYOUT, word_names=WORD_NAMES, word_width=WORD_WIDTH) -> PackPlan:
+    """Sprawdza specyfikację (zakresy, nakładanie bitów) i kompiluje ją do planu pakowania."""
+    names, word, shift, mask, encode, decode = [], [], [], [], [], []
+    used_bits = {w: 0 for w in word_names}
+
+    for name, word_name, offset, width, codes in layout:
+        if word_name not in used_bits:
+            raise ValueError(f"Sygnał '{name}': nieznane słowo '{word_name}'.")
+        if offset < 0 or width < 1 or offset + width > word_width:
+            raise ValueError(f"Sygnał '{name}': bity {offset}..{offset + width - 1} poza słowem {word_width}-bitowym.")
+        field_mask = (1 << width) - 1
+        if used_bits[word_name] & (field_mask << offset):
+            raise ValueError(f"Sygnał '{name}': bity nakładają się na inne pole w {word_name.upper()}.")
+        if codes and max(codes.values()) > field_mask:
+            raise ValueError(f"Sygnał '{name}': wartości nie mieszczą się w {width} bitach.")
+        used_bits[word_name] |= field_mask << offset
+
+        # Dekodowanie niejednoznacznych kodów (np. zeropage/pc_plus_offset) wybiera pierwszy klucz
+        reverse = {}
+        if codes:
+            for key, value in codes.items():
+                reverse.setdefault(value, key)
+
+        names.append(name)
+        word.append(word_names.index(word_name))
+        shift.append(offset)
+        mask.append(field_mask)
+        encode.append(codes)
+        decode.append(reverse if codes else None)
+
+    return PackPlan(tuple(word_names), word_width, tuple(names),
+                    {name: i for i, name in enumerate(names)},
+                    tuple(word), tuple(shift), tuple(mask), tuple(encode), tuple(decode))
+
+
+PACK_PLAN = compile_layout()
+
+
+def pack_signals(signals: dict, plan: PackPlan = PACK_PLAN) -> tuple:
+    """Składa słowa sterujące z aktywnych sygnałów (pętla tylko po ustawionych sygnałach)."""
+    words = [0] * len(plan.word_names)
+    index, word, shift, encode = plan.index, plan.word, plan.shift, plan.encode
+
+    for name, value in signals.items():
+        i = index.get(name)
+        if i is None:
+            raise ValueError(f"Sygnał '{name}' nie występuje w układzie słów sterujących.")
+        if not value:
+            continue
+        codes = encode[i]
+        if codes and value not in codes:
+            raise ValueError(f"Sygnał '{name}': nieznana wartość '{value}'.")
+        words[word[i]] |= (codes[value] if codes else 1) << shift[i]
+
+    return tuple(words)
+
+
+def format_word(value: int, plan: PackPlan = PACK_PLAN) -> str:
+    """Słowo sterujące jako HEX o szerokości wynikającej z plan.word_width."""
+    return f"{value:0{(plan.word_width + 3) // 4}X}"
+
+
+def unpack_fields(words, plan: PackPlan = PACK_PLAN) -> tuple:
+    """Surowe wartości pól (int) w kolejności plan.names."""
+    return tuple((words[w] >> shift) & mask for w, shift, mask in zip(plan.word, plan.shift, plan.mask))
+
+
+def decode_microword(words, plan: PackPlan = PACK_PLAN) -> dict:
+    """Rozkłada słowa sterujące z powrotem na pełny słownik sygnałów."""
+    signals = {}
+    for i, (name, raw) in enumerate(zip(plan.names, unpack_fields(words, plan))):
+        reverse = plan.decode[i]
+        if reverse is None:
+            signals[name] = bool(raw)
+        else:
+            signals[name] = reverse.get(raw, "none" if raw == 0 else f"0b{raw:0{plan.mask[i].bit_length()}b}")
+    return signals
+
+
+def describe_layout(plan: PackPlan = PACK_PLAN) -> str:
+    """Dokumentacja układu słów sterujących (Markdown) wygenerowana ze specyfikacji."""
+    lines = ["# Układ słów sterujących", ""]
+    for w, word_name in enumerate(plan.word_names):
+        lines += [f"## {word_name.upper()} ({plan.word_width} bit)", "",
+                  "| Bity | Sygnał | Wartości |", "|---|---|---|"]
+        fields = sorted((i for i in range(len(plan.names)) if plan.word[i] == w),
+                        key=lambda i: -plan.shift[i])
+        used = 0
+        for i in fields:
+            lo = plan.shift[i]
+            hi = lo + plan.mask[i].bit_length() - 1
+            used |= plan.mask[i] << lo
+            bits = f"{hi}" if hi == lo else f"{hi}..{lo}"
+            codes = plan.encode[i]
+            values = ", ".join(f"{k}={v:0{hi - lo + 1}b}" for k, v in codes.items()) if codes else "0/1"
+            lines.append(f"| {bits} | `{plan.names[i]}` | {values} |")
+        free = [str(b) for b in range(plan.word_width - 1, -1, -1) if not used & (1 << b)]
+        if free:
+            lines.append(f"| {', '.join(free)} | *(wolne)* | |")
+        lines.append("")
+    return "\n".join(lines)
+
 
 # ==============================================================================
 #  SEKCJA 2: PARSER I ASSEMBLER
 # ==============================================================================
-def generate_microcode(symbolic_code: str) -> tuple[int, int, int]:
-    signals = {
-        "alu_flags_ld": False, "alu_op_key": "none", "reg_a_load_en": False,
-        "reg_x_load_en": False, "reg_y_load_en": False, "reg_sp_load_en": False,
-        "reg_p_load_en": False, "reg_out_key": "none", "pc_inc_en": False,
-        "pc_load_en": False, "pc_out_addr_en": False, "addr_source_key": "none",
-        "adh_load_en": False, "adl_load_en": False, "x_add_to_addr_en": False,
-        "y_add_to_addr_en": False, "pch_out_en": False, "pcl_out_en": False,
-        "sp_int_inc_en": False, "sp_int_dec_en": False, "mem_read_en": False,
-        "mem_write_en": False, "data_bus_in_en": False, "data_bus_out_en": False,
-        "addr_out_bus_en": False, "p_c_set_en": False, "p_c_clr_en": False,
-        "p_d_set_en": False, "p_d_clr_en": False, "p_i_set_en": False,
-        "p_i_clr_en": False, "p_v_clr_en": False, "test_branch_en": False,
-        "cpu_master_reset_en": False, "reset_cycle_counter_en": False,
-        "load_ir_en": False, "tmp_load_en": False, "p_b_force_one_en": False
-    }
+def parse_signals(symbolic_code: str) -> dict:
+    """Tłumaczy kod symboliczny jednego cyklu na słownik aktywnych sygnałów sterujących."""
+    # Słownik zawiera tylko sygnały aktywne; brak klucza = sygnał nieaktywny / "none".
+    signals = {}
 
     if not symbolic_code:
-        return 0, 0, 0
+        return signals
 
     operations = [op.strip() for op in symbolic_code.lower().split(';')]
+    reads_alu_result = False
+    dl_from_mem = False
 
     for op in operations:
         if not op: continue
@@ -82,14 +245,14 @@ def generate_microcode(symbolic_code: str) -> tuple[int, int, int]:
             signals["pc_inc_en"] = True
         elif op == "end":
             signals["reset_cycle_counter_en"] = True
+        elif op == "skip_fetch":
+            signals["skip_fetch_en"] = True
         elif op == "alu_flags_ld":
             signals["alu_flags_ld"] = True
         elif op == "test_branch_en":
             signals["test_branch_en"] = True
         elif op.startswith('clrf('):
             signals[f"p_{op[5:-1]}_clr_en"] = True
-        elif op.startswith('setf('):
-            signals[f"p_{op[5:-1]}_set_en"] = True
         elif op.startswith('setf('):
             flag_name = op[5:-1].lower()
             if flag_name == 'b':
@@ -101,6 +264,8 @@ def generate_microcode(symbolic_code: str) -> tuple[int, int, int]:
             is_assignment = ":=" in op
             dest, source = (op.split(':=', 1) if is_assignment else ("", op))
             dest, source = dest.strip(), source.strip()
+            if dest == "dl" and source.startswith('*'):
+                dl_from_mem = True
 
             # 1. Modyfikatory źródła (+ X, + Y)
             if "+ x" in source:
@@ -126,7 +291,9 @@ def generate_microcode(symbolic_code: str) -> tuple[int, int, int]:
 
             # 3. Analiza Źródła
             if source == "alu_result":
-                signals["alu_op_key"] = "out"
+                # Wynik operacji z tego samego cyklu idzie prosto z ALU; OUT (zatrzask
+                # wyniku z poprzedniego cyklu) tylko gdy w cyklu nie ma operacji ALU
+                reads_alu_result = True
             elif source in REG_OUT_CODES:
                 signals["reg_out_key"] = source
             elif source in ["pch", "pcl"]:
@@ -158,8 +325,10 @@ def generate_microcode(symbolic_code: str) -> tuple[int, int, int]:
 
             # 4. Analiza Celu (Dest)
             if dest:
-                if dest in ["a", "x", "y", "sp", "p", "tmp", "ir", "adh", "adl"]:
-                    signals[f"{'reg_' if dest not in ['tmp', 'ir', 'adh', 'adl', 'p'] else ''}{dest}_load_en"] = True
+                if dest == "ir":
+                    signals["load_ir_en"] = True
+                elif dest in ["a", "x", "y", "sp", "p", "tmp", "adh", "adl"]:
+                    signals[f"{'reg_' if dest not in ['tmp', 'adh', 'adl'] else ''}{dest}_load_en"] = True
                 elif dest == "pc":
                     signals["pc_load_en"] = True
                 elif dest.startswith('*'):
@@ -184,63 +353,94 @@ def generate_microcode(symbolic_code: str) -> tuple[int, int, int]:
                     elif dest_addr == "sp":
                         signals["addr_source_key"] = "stack"
 
-    # --- Złożenie słów ---
-    w2 = ((1 if signals["alu_flags_ld"] else 0) << 15 |
-          ALU_OP_CODES.get(signals["alu_op_key"], 0) << 11 |
-          (1 if signals["reg_a_load_en"] else 0) << 10 |
-          (1 if signals["reg_x_load_en"] else 0) << 9 |
-          (1 if signals["reg_y_load_en"] else 0) << 8 |
-          (1 if signals["reg_sp_load_en"] else 0) << 7 |
-          (1 if signals["reg_p_load_en"] else 0) << 6 |
-          REG_OUT_CODES.get(signals["reg_out_key"], 0) << 3 |
-          (1 if signals["pc_inc_en"] else 0) << 2 |
-          (1 if signals["pc_load_en"] else 0) << 1 |
-          (1 if signals["pc_out_addr_en"] else 0))
-
-    w1 = (ADDR_SOURCE_CODES.get(signals["addr_source_key"], 0) << 12 |
-          (1 if signals["adh_load_en"] else 0) << 11 |
-          (1 if signals["adl_load_en"] else 0) << 10 |
-          (1 if signals["x_add_to_addr_en"] else 0) << 9 |
-          (1 if signals["y_add_to_addr_en"] else 0) << 8 |
-          (1 if signals["pch_out_en"] else 0) << 7 |
-          (1 if signals["pcl_out_en"] else 0) << 6 |
-          (1 if signals["sp_int_inc_en"] else 0) << 5 |
-          (1 if signals["sp_int_dec_en"] else 0) << 4 |
-          (1 if signals["mem_read_en"] else 0) << 3 |
-          (1 if signals["mem_write_en"] else 0) << 2 |
-          (1 if signals["data_bus_in_en"] else 0) << 1 |
-          (1 if signals["data_bus_out_en"] else 0))
-
-    w0 = ((1 if signals["p_b_force_one_en"] else 0) << 15 |
-          (1 if signals["p_c_set_en"] else 0) << 14 |
-          (1 if signals["p_c_clr_en"] else 0) << 13 |
-          (1 if signals["p_d_set_en"] else 0) << 12 |
-          (1 if signals["p_d_clr_en"] else 0) << 11 |
-          (1 if signals["p_i_set_en"] else 0) << 10 |
-          (1 if signals["p_i_clr_en"] else 0) << 9 |
-          (1 if signals["p_v_clr_en"] else 0) << 8 |
-          (1 if signals["tmp_load_en"] else 0) << 7 |
-          (1 if signals["addr_out_bus_en"] else 0) << 4 |
-          (1 if signals["test_branch_en"] else 0) << 3 |
-          (1 if signals["cpu_master_reset_en"] else 0) << 2 |
-          (1 if signals["reset_cycle_counter_en"] else 0) << 1 |
-          (1 if signals["load_ir_en"] else 0))
-
-    return w2, w1, w0
+    if reads_alu_result and "alu_op_key" not in signals:
+        signals["alu_op_key"] = "out"
+
+    # DL jest D-FlipFlopem: w takcie "DL := *src" jego wyjście ma jeszcze starą wartość.
+    # Operacja ALU na DL z tego samego taktu bierze więc wejście B z szyny danych (obejście).
+    if dl_from_mem and signals.get("reg_out_key") == "dl" and signals.get("alu_op_key", "out") != "out":
+        signals["alu_b_bus_en"] = True
+
+    return signals
+
+
+def generate_microcode(symbolic_code: str, plan: PackPlan = PACK_PLAN) -> tuple:
+    if not symbolic_code:
+        return (0,) * len(plan.word_names)
+
+    return pack_signals(parse_signals(symbolic_code), plan)
+
+
+# ==============================================================================
+#  SEKCJA 3: FETCH/EXECUTE OVERLAP
+# ==============================================================================
+# Sygnały, które zajmują magistralę pamięci, PC lub IR. Ostatni cykl, w którym
+# żaden z nich nie jest aktywny, może równolegle pobrać opkod następnej instrukcji.
+# Operand DL w takim cyklu jest bezpieczny: DL jest D-FlipFlopem, więc ALU liczy na
+# wartości sprzed taktu, a opkod trafia do DL dopiero na zboczu. Szyna danych dochodzi
+# do wejścia B ALU wyłącznie przez ALU_B_BUS_EN, którego scalony cykl nie może mieć.
+FETCH_CONFLICT_SIGNALS = (
+    "mem_read_en", "mem_write_en", "data_bus_in_en", "data_bus_out_en",
+    "addr_out_bus_en", "pc_inc_en", "pc_load_en", "pc_out_addr_en",
+    "pch_out_en", "pcl_out_en", "load_ir_en", "test_branch_en",
+    "cpu_master_reset_en", "skip_fetch_en", "alu_b_bus_en"
+)
+
+
+def can_overlap_fetch(symbolic_code: str) -> bool:
+    """Czy cykl kończący instrukcję (END) ma wolną magistralę dla FETCH następnej."""
+    if not symbolic_code:
+        return False
+    signals = parse_signals(symbolic_code)
+    if not signals.get("reset_cycle_counter_en") or signals.get("addr_source_key", "none") != "none":
+        return False
+    return not any(signals.get(name) for name in FETCH_CONFLICT_SIGNALS)
+
+
+def apply_fetch_overlap(microcode_map):
+    """
+    Zwraca kopię mapy, w której FETCH następnej instrukcji jest doklejony do
+    ostatniego cyklu wszędzie tam, gdzie magistrala jest wolna. Taki cykl ustawia
+    SKIP_FETCH, więc kolejna instrukcja startuje od T1 (cykl T0 zostaje w ROM dla
+    instrukcji, które nie mogą nałożyć FETCH).
+    """
+    fetch_ops = [op.strip() for op in FETCH[0].split(';')]
+    overlapped = {}
+
+    for opcode, (mnemonic, addressing_mode, cycles) in microcode_map.items():
+        if cycles and can_overlap_fetch(cycles[-1]):
+            ops = [op.strip() for op in cycles[-1].split(';') if op.strip()]
+            ops = [op for op in ops if op.lower() != "end"] + fetch_ops + ["SKIP_FETCH", "END"]
+            merged = "; ".join(ops)
+            # Opkod z FETCH nie może dojść do wejścia B ALU (patrz FETCH_CONFLICT_SIGNALS)
+            if parse_signals(merged).get("alu_b_bus_en"):
+                raise ValueError(f"Opcode {opcode:02X}: scalony FETCH podałby opkod na wejście B ALU.")
+            cycles = cycles[:-1] + [merged]
+        overlapped[opcode] = (mnemonic, addressing_mode, cycles)
+
+    return overlapped
+
+
+def effective_cycles(cycles: list) -> int:
+    """Liczba cykli instrukcji w strumieniu (bez T0, jeśli FETCH następnej jest nałożony)."""
+    if cycles and parse_signals(cycles[-1]).get("skip_fetch_en"):
+        return len(cycles) - 1
+    return len(cycles)
 
 
 # ==============================================================================
-#  SEKCJA 3: FUNKCJE POMOCNICZE (Z ZAPISEM DO FOLDERU)
+#  SEKCJA 4: FUNKCJE POMOCNICZE (Z ZAPISEM DO FOLDERU)
 # ==============================================================================
 def translate_instruction(name: str, cycles: list):
     print(f"--- Mikrokod dla instrukcji: {name} ---")
     for i, cycle_code in enumerate(cycles):
-        w2, w1, w0 = generate_microcode(cycle_code)
-        print(f"Cykl {i}: {cycle_code:<55} -> W2={w2:04X}, W1={w1:04X}, W0={w0:04X}")
+        words = generate_microcode(cycle_code)
+        print(f"Cykl {i}: {cycle_code:<55} -> "
+              + ", ".join(f"{name.upper()}={format_word(w)}" for name, w in zip(PACK_PLAN.word_names, words)))
     print("-" * 80)
 
 
-def generate_rom_files(microcode_map, num_opcodes=256, max_cycles=8):
+def generate_rom_files(microcode_map, num_opcodes=256, max_cycles=8, plan=PACK_PLAN):
     print(f"\n--- Generowanie plików tekstowych ROM w katalogu '{OUTPUT_DIR}' ---")
 
     # Upewnij się, że katalog istnieje
@@ -249,10 +449,10 @@ def generate_rom_files(microcode_map, num_opcodes=256, max_cycles=8):
 
     num_banks = max_cycles
     words_per_bank = num_opcodes
+    empty = format_word(0, plan)
 
-    roms_w2 = [["0000"] * words_per_bank for _ in range(num_banks)]
-    roms_w1 = [["0000"] * words_per_bank for _ in range(num_banks)]
-    roms_w0 = [["0000"] * words_per_bank for _ in range(num_banks)]
+    # roms[słowo][bank][opkod], słowa w kolejności plan.word_names (W2, W1, W0)
+    roms = [[[empty] * words_per_bank for _ in range(num_banks)] for _ in plan.word_names]
 
     for opcode, data in microcode_map.items():
         _mnemonic, _addressing_mode, cycles = data
@@ -260,24 +460,17 @@ def generate_rom_files(microcode_map, num_opcodes=256, max_cycles=8):
             if cycle_index >= max_cycles:
                 continue
 
-            w2, w1, w0 = generate_microcode(symbolic_code)
-
-            roms_w2[cycle_index][opcode] = f"{w2:04X}"
-            roms_w1[cycle_index][opcode] = f"{w1:04X}"
-            roms_w0[cycle_index][opcode] = f"{w0:04X}"
+            for w, value in enumerate(generate_microcode(symbolic_code, plan)):
+                roms[w][cycle_index][opcode] = format_word(value, plan)
 
     try:
         for i in range(num_banks):
             # Zapisz pliki w katalogu OUTPUT_DIR
-            path_w2 = os.path.join(OUTPUT_DIR, f"w2b{i}.rom")
-            path_w1 = os.path.join(OUTPUT_DIR, f"w1b{i}.rom")
-            path_w0 = os.path.join(OUTPUT_DIR, f"w0b{i}.rom")
+            for w, word_name in enumerate(plan.word_names):
+                path = os.path.join(OUTPUT_DIR, f"{word_name}b{i}.rom")
+                with open(path, "w") as f: f.write("\n".join(roms[w][i]))
 
-            with open(path_w2, "w") as f: f.write("\n".join(roms_w2[i]))
-            with open(path_w1, "w") as f: f.write("\n".join(roms_w1[i]))
-            with open(path_w0, "w") as f: f.write("\n".join(roms_w0[i]))
-
-        print(f"Pomyślnie wygenerowano {num_banks * 3} plików tekstowych.")
+        print(f"Pomyślnie wygenerowano {num_banks * len(plan.word_names)} plików tekstowych.")
     except IOError as e:
         print(f"Błąd podczas zapisu plików tekstowych: {e}")
 
@@ -293,47 +486,109 @@ def generate_csv_log(microcode_map):
     try:
         with open(log_path, "w", newline="", encoding="utf-8") as f:
             writer = csv.writer(f)
-            writer.writerow(['Opcode', 'Mnemonic', 'Addressing', 'Cycle', 'Symbolic Code', 'W2', 'W1', 'W0'])
+            writer.writerow(['Opcode', 'Mnemonic', 'Addressing', 'Cycle', 'Symbolic Code']
+                            + [name.upper() for name in PACK_PLAN.word_names])
 
             for opcode, data in sorted(microcode_map.items()):
                 mnemonic, addressing_mode, cycles = data
                 for cycle_index, symbolic_code in enumerate(cycles):
-                    w2, w1, w0 = generate_microcode(symbolic_code)
+                    words = generate_microcode(symbolic_code)
                     writer.writerow([
                         f"{opcode:02X}",
                         mnemonic,
                         addressing_mode,
                         cycle_index,
                         symbolic_code if symbolic_code else "NO-OP",
-                        f"{w2:04X}", f"{w1:04X}", f"{w0:04X}"
-                    ])
+                    ] + [format_word(w) for w in words])
         print(f"Pomyślnie wygenerowano plik {log_path}")
     except IOError as e:
         print(f"Błąd podczas zapisu pliku CSV: {e}")
 
 
+def generate_layout_doc(plan: PackPlan = PACK_PLAN):
+    print(f"\n--- Generowanie dokumentacji układu słów w katalogu '{OUTPUT_DIR}' ---")
+
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
+
+    doc_path = os.path.join(OUTPUT_DIR, "control_word_layout.md")
+    try:
+        with open(doc_path, "w", encoding="utf-8") as f:
+            f.write(describe_layout(plan))
+        print(f"Pomyślnie wygenerowano plik {doc_path}")
+    except IOError as e:
+        print(f"Błąd podczas zapisu dokumentacji układu: {e}")
+
+
+def generate_cycle_report(microcode_map, overlapped_map):
+    print(f"\n--- Generowanie raportu kosztu cykli w katalogu '{OUTPUT_DIR}' ---")
+
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
+
+    report_path = os.path.join(OUTPUT_DIR, "cycle_costs.csv")
+    total_base = total_overlap = merged_count = 0
+
+    try:
+        with open(report_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(['Opcode', 'Mnemonic', 'Addressing', 'Cycles', 'Cycles (overlap)', 'Saved'])
+
+            for opcode, (mnemonic, addressing_mode, cycles) in sorted(microcode_map.items()):
+                base = effective_cycles(cycles)
+                overlap = effective_cycles(overlapped_map[opcode][2])
+                total_base += base
+                total_overlap += overlap
+                if overlap < base:
+                    merged_count += 1
+                writer.writerow([f"{opcode:02X}", mnemonic, addressing_mode, base, overlap, base - overlap])
+        print(f"Pomyślnie wygenerowano plik {report_path}")
+    except IOError as e:
+        print(f"Błąd podczas zapisu raportu cykli: {e}")
+        return
+
+    count = len(microcode_map)
+    saved = total_base - total_overlap
+    print(f"Fetch overlap: {merged_count}/{count} opkodów oszczędza 1 cykl.")
+    print(f"Średni koszt instrukcji: {total_base / count:.2f} -> {total_overlap / count:.2f} cykli "
+          f"(-{saved / total_base:.1%}).")
+
+
 # ==============================================================================
-#  SEKCJA 4: MAIN
+#  SEKCJA 5: MAIN
 # ==============================================================================
 if __name__ == "__main__":
     print("--- Walidacja mapy mikrokodu ---")
+    overlap_enabled = FETCH_OVERLAP or "--overlap" in sys.argv
     error_found = False
     for opcode, data in MICROCODE_MAP.items():
         mnemonic, addressing_mode, cycles = data
         if len(cycles) > 8:
             print(f"BŁĄD: {mnemonic} {addressing_mode} (Opcode {opcode:02X}) ma {len(cycles)} cykli!")
             error_found = True
+        # Po nałożonym FETCH cykl T0 jest pomijany, więc musi być identyczny dla wszystkich opkodów
+        if overlap_enabled and cycles and cycles[0] != FETCH[0]:
+            print(f"BŁĄD: {mnemonic} {addressing_mode} (Opcode {opcode:02X}) ma w T0 '{cycles[0]}' zamiast FETCH.")
+            error_found = True
 
     if not error_found:
         print("Walidacja długości cykli OK.")
 
+        overlapped_map = apply_fetch_overlap(MICROCODE_MAP)
+        build_map = MICROCODE_MAP
+        if overlap_enabled:
+            build_map = overlapped_map
+            print("Fetch overlap WŁĄCZONY (SKIP_FETCH w W0.5).")
+
         test_opcodes = [0xA9, 0x69, 0xBD, 0xF0, 0x4C]
         for op in test_opcodes:
-            if op in MICROCODE_MAP:
-                data = MICROCODE_MAP[op]
+            if op in build_map:
+                data = build_map[op]
                 translate_instruction(f"{data[0]} {data[1]}", data[2])
 
-        generate_rom_files(MICROCODE_MAP)
-        generate_csv_log(MICROCODE_MAP)
+        generate_rom_files(build_map)
+        generate_csv_log(build_map)
+        generate_cycle_report(MICROCODE_MAP, overlapped_map)
+        generate_layout_doc()
     else:
         print("Popraw błędy przed generowaniem plików.")
\ No newline at end of file
@@ -0,0 +1,180 @@
+# ucode_coverage.py
+# -*- coding: utf-8 -*-
+# Pokrycie mikrokodu: ile razy wykonano każdy slot ROM (T * 256 + opkod)
+# podczas uruchamiania programów testowych na executor.MicrocodeExecutor.
+#
+# Zbieranie jest opcjonalne i tanie: jeden inkrement w prealokowanej tablicy
+# na takt. Sygnały sterujące i brakujące mikrosłowa są wyliczane dopiero przy
+# raporcie (z trafień slotów i zdekodowanych słów), nie w trakcie wykonania.
+#
+# Uwaga: T0 sprzęt adresuje kolumną POPRZEDNIEGO opkodu (IR jeszcze go trzyma),
+# a przy nałożonym FETCH (--overlap) T0 jest pomijany. Trafienia T0 nie mówią więc
+# nic o danym opkodzie - raporty liczą T0 (wspólny FETCH) łącznie dla wszystkich.
+
+import argparse
+import json
+import math
+from array import array
+
+from executor import NUM_BANKS, NUM_OPCODES, NUM_SLOTS, load_banks
+from instructions import FETCH, MICROCODE_MAP
+from ucode import OUTPUT_DIR, PACK_PLAN, apply_fetch_overlap, unpack_fields
+
+COVERAGE_FORMAT = "ucode-coverage"
+COVERAGE_VERSION = 1
+
+
+class CoverageCollector:
+    """Liczniki trafień slotów ROM w prealokowanej tablicy (bez słowników w pętli taktów)."""
+
+    def __init__(self, num_slots=NUM_SLOTS):
+        self.hits = array("Q", bytes(8 * num_slots))
+        self.runs = 0
+
+    def attach(self, executor):
+        """Włącza zliczanie w wykonawcy; kolejne uruchomienia sumują się w tej samej tablicy."""
+        executor.coverage = self.hits
+        self.runs += 1
+
+    @staticmethod
+    def detach(executor):
+        executor.coverage = None
+
+    def merge(self, other):
+        hits = self.hits
+        for slot, count in enumerate(other.hits):
+            if count:
+                hits[slot] += count
+        self.runs += other.runs
+
+    def dump(self, path):
+        """Zapisuje tylko niezerowe sloty (JSON), żeby pliki z wielu uruchomień dało się łączyć."""
+        data = {
+            "format": COVERAGE_FORMAT,
+            "version": COVERAGE_VERSION,
+            "slots": len(self.hits),
+            "runs": self.runs,
+            "hits": {str(slot): count for slot, count in enumerate(self.hits) if count},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != COVERAGE_FORMAT:
+            raise ValueError(f"{path}: to nie jest plik pokrycia mikrokodu.")
+        collector = cls(data.get("slots", NUM_SLOTS))
+        for slot, count in data["hits"].items():
+            collector.hits[int(slot)] = count
+        collector.runs = data.get("runs", 1)
+        return collector
+
+    def opcode_hits(self, opcode):
+        return [self.hits[(t << 8) | opcode] for t in range(NUM_BANKS)]
+
+    def fetch_hits(self):
+        """Trafienia T0 (wspólny FETCH) zsumowane po wszystkich kolumnach."""
+        return sum(self.hits[:NUM_OPCODES])
+
+
+# ==============================================================================
+#  RAPORTY
+# ==============================================================================
+def _shade(count):
+    """'.' = 0, cyfra 1..9 = rząd wielkości liczby trafień."""
+    if not count:
+        return "."
+    return str(min(9, int(math.log10(count)) + 1))
+
+
+def render_heatmap(collector, microcode_map=MICROCODE_MAP):
+    """Mapa opkod x cykl; puste pole = cykl spoza instrukcji, '-' = T0 (liczony łącznie)."""
+    lines = [f"T0 (wspólny FETCH): {collector.fetch_hits()} trafień", "",
+             "Opkod Instrukcja      T: " + " ".join(str(t) for t in range(NUM_BANKS)),
+             "-" * (25 + 2 * NUM_BANKS)]
+    for opcode, (mnemonic, addressing_mode, cycles) in sorted(microcode_map.items()):
+        hits = collector.opcode_hits(opcode)
+        cells = ["-"] + [_shade(hits[t]) if t < len(cycles) else " " for t in range(1, NUM_BANKS)]
+        lines.append(f"  {opcode:02X}  {mnemonic} {addressing_mode:<12}  " + " ".join(cells))
+    return "\n".join(lines)
+
+
+def never_executed(collector, microcode_map=MICROCODE_MAP):
+    """
+    Lista (opkod, cykl, mnemonik, tryb, kod symboliczny) nigdy niewykonanych mikrosłów.
+    T0 jest jednym wpisem (opkod None), gdy nie trafiono żadnego FETCH.
+    """
+    missing = []
+    if not collector.fetch_hits():
+        missing.append((None, 0, "FETCH", "", FETCH[0]))
+    for opcode, (mnemonic, addressing_mode, cycles) in sorted(microcode_map.items()):
+        for t, symbolic_code in enumerate(cycles[1:NUM_BANKS], start=1):
+            if not collector.hits[(t << 8) | opcode]:
+                missing.append((opcode, t, mnemonic, addressing_mode, symbolic_code))
+    return missing
+
+
+def signal_hits(collector, rom, plan=PACK_PLAN):
+    """Liczba taktów, w których każdy sygnał sterujący był aktywny (niezerowy)."""
+    totals = [0] * len(plan.names)
+    for slot, count in enumerate(collector.hits):
+        if not count:
+            continue
+        for i, raw in enumerate(unpack_fields(rom[slot], plan)):
+            if raw:
+                totals[i] += count
+    return dict(zip(plan.names, totals))
+
+
+def print_report(collector, rom, microcode_map=MICROCODE_MAP):
+    executed = sum(1 for count in collector.hits if count)
+    defined = 1 + sum(max(0, min(len(cycles), NUM_BANKS) - 1) for _m, _a, cycles in microcode_map.values())
+    missing = never_executed(collector, microcode_map)
+
+    print(f"--- Pokrycie mikrokodu ({collector.runs} uruchomień, {sum(collector.hits)} taktów) ---")
+    print(f"Sloty wykonane: {executed}/{NUM_BANKS * NUM_OPCODES}, "
+          f"mikrosłowa z MICROCODE_MAP: {defined - len(missing)}/{defined}\n")
+    print(render_heatmap(collector, microcode_map))
+
+    signals = signal_hits(collector, rom)
+    unused = [name for name, count in signals.items() if not count]
+    print("\n--- Sygnały sterujące (aktywne takty) ---")
+    for name, count in signals.items():
+        print(f"  {name:<24} {count}")
+    if unused:
+        print(f"\nNIGDY NIE AKTYWNE: {', '.join(unused)}")
+
+    print(f"\n--- Niewykonane mikrosłowa ({len(missing)}) ---")
+    for opcode, t, mnemonic, addressing_mode, symbolic_code in missing:
+        label = "--" if opcode is None else f"{opcode:02X}"
+        print(f"  {label} {mnemonic} {addressing_mode:<8} T{t}: {symbolic_code or 'NO-OP'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Łączenie i raportowanie pokrycia mikrokodu.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    merge_cmd = sub.add_parser("merge", help="połącz pliki pokrycia z wielu uruchomień")
+    merge_cmd.add_argument("output")
+    merge_cmd.add_argument("inputs", nargs="+")
+
+    report_cmd = sub.add_parser("report", help="mapa opkod x cykl, sygnały i niewykonane mikrosłowa")
+    report_cmd.add_argument("inputs", nargs="+")
+    report_cmd.add_argument("--build-dir", default=OUTPUT_DIR, help="katalog z plikami wYbX.rom")
+    report_cmd.add_argument("--overlap", action="store_true",
+                            help="ROM zbudowany z nałożonym FETCH (python ucode.py --overlap)")
+
+    args = parser.parse_args()
+
+    merged = CoverageCollector.load(args.inputs[0])
+    for path in args.inputs[1:]:
+        merged.merge(CoverageCollector.load(path))
+
+    if args.command == "merge":
+        merged.dump(args.output)
+        print(f"Połączono {len(args.inputs)} plików ({merged.runs} uruchomień) do {args.output}")
+    else:
+        report_map = apply_fetch_overlap(MICROCODE_MAP) if args.overlap else MICROCODE_MAP
+        print_report(merged, load_banks(args.build_dir), report_map)
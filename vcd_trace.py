@@ -0,0 +1,145 @@
+# vcd_trace.py
+# -*- coding: utf-8 -*-
+# Eksport przebiegów sygnałów sterujących do pliku VCD (Value Change Dump),
+# do obejrzenia w GTKWave/Surfer zamiast krokowania w symulatorze GUI.
+#
+# Jeden takt = jedna jednostka czasu. W takcie T zapisywane są: słowo sterujące
+# wykonane w tym takcie (wszystkie pola W2/W1/W0), IR i licznik cykli oraz
+# rejestry na początku taktu, a także szyna adresowa i danych z tego taktu.
+# Zapis jest strumieniowy: tylko zmienione sygnały, bufor o stałym rozmiarze.
+
+import argparse
+import time
+
+from executor import MicrocodeExecutor, load_banks, parse_int
+from ucode import OUTPUT_DIR, PACK_PLAN, unpack_fields
+
+# Identyfikatory VCD: znaki drukowalne '!'..'~'
+_ID_CHARS = [chr(c) for c in range(33, 127)]
+
+REGISTER_SIGNALS = [
+    ("IR", 8), ("T", 3), ("PC", 16), ("A", 8), ("X", 8), ("Y", 8), ("SP", 8), ("P", 8),
+    ("DL", 8), ("TMP", 8), ("ADL", 8), ("ADH", 8),
+]
+BUS_SIGNALS = [("ADDR_BUS", 16), ("DATA_BUS", 8)]
+
+
+def _identifier(index):
+    ident = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, len(_ID_CHARS))
+        ident = _ID_CHARS[rem] + ident
+    return ident
+
+
+class VcdWriter:
+    """Strumieniowy zapis VCD: emituje tylko zmienione wartości, bufor opróżniany co buffer_lines linii."""
+
+    def __init__(self, path, scopes, timescale="1 us", buffer_lines=8192):
+        self.file = open(path, "w", encoding="ascii")
+        self.buffer = []
+        self.buffer_lines = buffer_lines
+        self.ids, self.widths = [], []
+
+        header = ["$version MOS-8502 microcode vcd_trace $end", f"$timescale {timescale} $end"]
+        for scope, signals in scopes:
+            header.append(f"$scope module {scope} $end")
+            for name, width in signals:
+                ident = _identifier(len(self.ids))
+                self.ids.append(ident)
+                self.widths.append(width)
+                header.append(f"$var wire {width} {ident} {name} $end")
+            header.append("$upscope $end")
+        header.append("$enddefinitions $end")
+        self.file.write("\n".join(header) + "\n")
+
+        self.last = [None] * len(self.ids)
+
+    def _format(self, i, value):
+        if self.widths[i] == 1:
+            return f"{value & 1}{self.ids[i]}"
+        return f"b{value:b} {self.ids[i]}"
+
+    def sample(self, timestamp, values):
+        """Zapisuje wartości (w kolejności deklaracji); do pliku trafiają tylko zmiany."""
+        last = self.last
+        changes = [i for i, value in enumerate(values) if value != last[i]]
+        if not changes:
+            return
+        buffer = self.buffer
+        buffer.append(f"#{timestamp}")
+        for i in changes:
+            value = values[i]
+            last[i] = value
+            buffer.append(self._format(i, value))
+        if len(buffer) >= self.buffer_lines:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write("\n".join(self.buffer) + "\n")
+            self.buffer.clear()
+
+    def close(self, timestamp=None):
+        if self.file.closed:
+            return
+        if timestamp is not None:
+            self.buffer.append(f"#{timestamp}")
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def control_signals(plan=PACK_PLAN):
+    return [(name.upper(), plan.mask[i].bit_length()) for i, name in enumerate(plan.names)]
+
+
+def trace_execution(executor, path, cycles, plan=PACK_PLAN):
+    """
+    Wykonuje zadaną liczbę taktów, zapisując przebiegi do pliku VCD. Czas w VCD
+    liczony jest lokalnie (od executor.cycles w chwili startu), bo RESET z mikrokodu
+    zeruje executor.cycles, a znaczniki czasu VCD muszą rosnąć.
+    """
+    slot_fields = [unpack_fields(words, plan) for words in executor.rom]
+    scopes = [("control", control_signals(plan)), ("cpu", REGISTER_SIGNALS), ("bus", BUS_SIGNALS)]
+    step = executor.step
+    e = executor
+
+    with VcdWriter(path, scopes) as writer:
+        first = e.cycles
+        for timestamp in range(first, first + cycles):
+            state = (e.ir, e.t, e.pc, e.a, e.x, e.y, e.sp, e.p, e.dl, e.tmp, e.adl, e.adh)
+            fields = slot_fields[(e.t << 8) | e.ir]
+            step()
+            writer.sample(timestamp, fields + state + (e.addr_bus, e.data_bus))
+        writer.close(first + cycles)
+    return cycles
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Eksport przebiegów mikrokodu do pliku VCD.")
+    parser.add_argument("program", help="plik binarny programu")
+    parser.add_argument("-o", "--output", default="trace.vcd", help="plik wyjściowy VCD")
+    parser.add_argument("--load", type=parse_int, default=0x0000, help="adres ładowania (domyślnie $0000)")
+    parser.add_argument("--start", type=parse_int, default=None, help="adres startu (domyślnie wektor RESET)")
+    parser.add_argument("--skip", type=int, default=0, help="liczba taktów wykonanych przed rozpoczęciem zapisu")
+    parser.add_argument("--cycles", type=int, default=100_000, help="liczba zapisywanych taktów")
+    parser.add_argument("--build-dir", default=OUTPUT_DIR, help="katalog z plikami wYbX.rom")
+    args = parser.parse_args()
+
+    executor = MicrocodeExecutor(load_banks(args.build_dir))
+    with open(args.program, "rb") as f:
+        executor.load(f.read(), args.load)
+    executor.reset(args.start)
+    executor.run(args.skip)
+
+    started = time.perf_counter()
+    traced = trace_execution(executor, args.output, args.cycles)
+    elapsed = time.perf_counter() - started
+    print(f"Zapisano {traced} taktów (od {args.skip}) do {args.output} w {elapsed:.2f} s.")